@@ -0,0 +1,113 @@
+import argparse
+
+import numpy as np
+
+from records import read_records, write_records
+
+# categories with fewer apps than this are compared against the whole dataset instead
+MIN_GROUP_SIZE = 5
+
+
+def to_columns(records):
+    # columnar view of the metric fields get_app_details captures, one array entry per app
+    def metric(record, *path):
+        value = record.get("metrics", {})
+        for key in path:
+            value = (value or {}).get(key)
+        return value or 0
+
+    def histogram(record):
+        dist = metric(record, "ratings", "distribution") or {}
+        return [dist.get(star, dist.get(str(star), 0)) or 0 for star in range(1, 6)]
+
+    return {
+        "appId": np.array([record.get("appId") for record in records]),
+        "categoryId": np.array([record.get("categoryId") or "" for record in records]),
+        "average": np.array([metric(record, "ratings", "average") for record in records], dtype=float),
+        "ratings": np.array([metric(record, "ratings", "total") for record in records], dtype=float),
+        "reviews": np.array([metric(record, "reviews") for record in records], dtype=float),
+        "installs": np.array([metric(record, "installs", "min") for record in records], dtype=float),
+        "realInstalls": np.array([metric(record, "installs", "max") for record in records], dtype=float),
+        "histogram": np.array([histogram(record) for record in records], dtype=float).reshape(-1, 5),
+    }
+
+
+def robust_z(values, groups):
+    # (x - median) / (1.4826 * MAD) within each group, small groups use the global statistics
+    z = np.zeros_like(values)
+    labels, counts = np.unique(groups, return_counts=True)
+    pooled = np.isin(groups, labels[counts < MIN_GROUP_SIZE])
+    for mask in [groups == label for label in labels[counts >= MIN_GROUP_SIZE]] + [pooled]:
+        if not mask.any():
+            continue
+        reference = values if mask is pooled else values[mask]
+        median = np.median(reference)
+        mad = np.median(np.abs(reference - median)) * 1.4826
+        z[mask] = (values[mask] - median) / (mad if mad > 0 else 1.0)
+    return z
+
+
+def anomaly_scores(records):
+    # one vectorized pass over the category, returns a list of per-app score dicts aligned with records
+    cols = to_columns(records)
+    if len(records) == 0:
+        return []
+    groups = cols["categoryId"]
+    hist = cols["histogram"]
+    total = hist.sum(axis=1)
+    share = np.divide(hist, total[:, None], out=np.zeros_like(hist), where=total[:, None] > 0)
+
+    # J-shape: mass on both 1 and 5 stars with an empty middle, typical of bought ratings plus angry victims
+    j_shape = np.sqrt(share[:, 0] * share[:, 4]) * (1 - share[:, 1:4].sum(axis=1))
+    installs = np.maximum(cols["realInstalls"], cols["installs"])
+    ratings_per_install = np.log10((cols["ratings"] + 1) / (installs + 1))
+    reviews_per_rating = np.log10((cols["reviews"] + 1) / (cols["ratings"] + 1))
+    five_star_z = robust_z(share[:, 4], groups)
+    # the histogram should reproduce the advertised average
+    implied_average = np.divide(hist @ np.arange(1, 6), total, out=np.zeros_like(total), where=total > 0)
+    average_gap = np.where(total > 0, np.abs(implied_average - cols["average"]), 0)
+
+    ratings_z = robust_z(ratings_per_install, groups)
+    reviews_z = robust_z(reviews_per_rating, groups)
+    score = (
+        np.clip(np.abs(ratings_z), 0, 5) / 5
+        + np.clip(np.abs(reviews_z), 0, 5) / 5
+        + np.clip(five_star_z, 0, 5) / 5
+        + 2 * j_shape
+        + np.clip(average_gap, 0, 1)
+    ) / 6
+    # apps with only a handful of ratings have histograms too noisy to judge
+    score = np.where(total >= 20, score, score * total / 20)
+
+    return [
+        {
+            "score": round(float(score[i]), 3),
+            "jShape": round(float(j_shape[i]), 3),
+            "ratingsPerInstallZ": round(float(ratings_z[i]), 2),
+            "reviewsPerRatingZ": round(float(reviews_z[i]), 2),
+            "fiveStarShareZ": round(float(five_star_z[i]), 2),
+            "averageGap": round(float(average_gap[i]), 2),
+        }
+        for i in range(len(records))
+    ]
+
+
+def attach_anomaly_scores(records):
+    records = list(records)
+    for record, anomaly in zip(records, anomaly_scores(records)):
+        record["anomaly"] = anomaly
+    return records
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score rating / install anomalies over a category dataset")
+    parser.add_argument("path")
+    parser.add_argument("--out", help="write the records with an `anomaly` field to this jsonl file")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    records = attach_anomaly_scores(read_records(args.path))
+    for record in sorted(records, key=lambda r: r["anomaly"]["score"], reverse=True)[: args.top]:
+        print(f"{record['anomaly']['score']:.3f}  {record['appId']}  {record['anomaly']}")
+    if args.out:
+        write_records(args.out, records)
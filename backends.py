@@ -0,0 +1,49 @@
+import os
+import threading
+
+import google_play_scraper
+
+# Pluggable service backends. The defaults talk to the live services, tests and benchmarks
+# swap in the local stand-ins from fakes.py with set_llm / set_play.
+_backends = {}
+_lock = threading.Lock()
+
+
+def get_llm():
+    # anything with `.models.generate_content(model=, contents=, config=)`, created lazily so
+    # importing llm.py needs no api key
+    with _lock:
+        if "llm" not in _backends:
+            from google import genai
+
+            _backends["llm"] = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+        return _backends["llm"]
+
+
+def set_llm(client):
+    _backends["llm"] = client
+
+
+def get_play():
+    # anything with google_play_scraper's `app`, `reviews`, `permissions` and `search` functions
+    return _backends.get("play", google_play_scraper)
+
+
+def set_play(backend):
+    _backends["play"] = backend
+
+
+def get_batch():
+    # anything with `submit(path, model) -> job id`, `status(job id)` and `results(job id)`, see batch.py.
+    # BATCH_BUCKET selects vertex ai batch prediction, otherwise jobs run locally through get_llm()
+    with _lock:
+        if "batch" not in _backends:
+            from batch import LocalBatchBackend, VertexBatchBackend
+
+            bucket = os.getenv("BATCH_BUCKET")
+            _backends["batch"] = VertexBatchBackend(bucket) if bucket else LocalBatchBackend()
+        return _backends["batch"]
+
+
+def set_batch(backend):
+    _backends["batch"] = backend
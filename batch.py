@@ -0,0 +1,352 @@
+import argparse
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from itertools import islice
+
+import psutil
+
+from backends import get_batch, get_llm
+from cache import CACHE_DIR, make_key
+from llm import (
+    ASPECTS,
+    PROMPTS,
+    SYSTEM_PROMPT,
+    overall_prompt,
+    response_cache,
+    typical_permissions,
+)
+from permission_index import score_permissions
+from ratelimit import call, estimate_tokens
+from records import read_records, write_records
+from tracing import span
+
+BATCH_DIR = os.path.join(CACHE_DIR, "batches")
+BATCH_MODEL = "gemini-2.0-flash"
+# same generation settings as analyze_fraud, so batch and interactive runs share response cache entries
+BATCH_CONFIG = {"temperature": 0.5, "response_mime_type": "application/json"}
+DONE_STATES = ("succeeded", "failed", "cancelled", "expired")
+# stored with the pid of the process running a local job
+PROCESS_STARTED = psutil.Process().create_time()
+# batch services complete jobs within 24 hours, anything still pending after that is left for the next run
+BATCH_TIMEOUT = 24 * 3600
+
+
+def camel(name):
+    return re.sub(r"_([a-z])", lambda m: m.group(1).upper(), name)
+
+
+def snake(name):
+    return re.sub(r"([A-Z])", r"_\1", name).lower()
+
+
+def batch_request(key, text, config=BATCH_CONFIG):
+    # one line of a batch job file, the request body is the REST GenerateContentRequest
+    return {
+        "key": key,
+        "request": {
+            "contents": [{"role": "user", "parts": [{"text": text}]}],
+            "generationConfig": {camel(k): v for k, v in config.items()},
+        },
+    }
+
+
+def request_text(line):
+    return "".join(part.get("text", "") for content in line["request"]["contents"] for part in content["parts"])
+
+
+# Runs a job file through the configured llm backend on a background thread, writing output.jsonl and a
+# status file next to it. Stands in for a batch service in tests, or turns a batch run into an interactive
+# one that still respects the rate limits. The job lives only as long as the process running it, a job
+# whose process is gone is started again from its input.jsonl when polled.
+class LocalBatchBackend:
+    def __init__(self, path=os.path.join(BATCH_DIR, "local"), workers=4):
+        self.path = path
+        self.workers = workers
+        self._threads = {}
+
+    def _dir(self, job_id):
+        return os.path.join(self.path, job_id)
+
+    def _set_status(self, job_id, state, **fields):
+        with open(os.path.join(self._dir(job_id), "status.json"), "w", encoding="utf-8") as f:
+            json.dump({"state": state, "time": time.time(), "pid": os.getpid(), "started": PROCESS_STARTED, **fields}, f)
+
+    def _start(self, job_id, model, lines):
+        self._set_status(job_id, "running", model=model)
+        thread = threading.Thread(target=self._run, args=(job_id, model, lines), daemon=True)
+        self._threads[job_id] = thread
+        thread.start()
+
+    def submit(self, path, model):
+        job_id = uuid.uuid4().hex[:12]
+        os.makedirs(self._dir(job_id))
+        lines = list(read_records(path))
+        write_records(os.path.join(self._dir(job_id), "input.jsonl"), lines)
+        self._start(job_id, model, lines)
+        return job_id
+
+    def _alive(self, job_id, status):
+        # a pid only identifies the process together with its start time, pids get reused
+        pid, started = status.get("pid"), status.get("started")
+        if pid == os.getpid() and started == PROCESS_STARTED:
+            thread = self._threads.get(job_id)
+            return thread is not None and thread.is_alive()
+        try:
+            process = psutil.Process(pid)
+            return process.create_time() == started and process.status() != psutil.STATUS_ZOMBIE
+        except (psutil.Error, TypeError, ValueError):
+            return False
+
+    def _run(self, job_id, model, lines):
+        output = os.path.join(self._dir(job_id), "output.jsonl")
+        lock = threading.Lock()
+        pending = iter(lines)
+
+        def worker(f):
+            while True:
+                with lock:
+                    line = next(pending, None)
+                if line is None:
+                    return
+                request = line["request"]
+                config = {snake(k): v for k, v in request.get("generationConfig", {}).items()}
+                try:
+                    response = call(
+                        model,
+                        get_llm().models.generate_content,
+                        model=model,
+                        contents=request["contents"],
+                        config=config,
+                        tokens=estimate_tokens(request_text(line)),
+                    )
+                    result = {"key": line["key"], "response": {"text": response.text}}
+                except Exception as e:
+                    result = {"key": line["key"], "error": str(e)}
+                with lock:
+                    f.write(json.dumps(result, ensure_ascii=False) + "\n")
+                    f.flush()
+
+        try:
+            with open(output, "w", encoding="utf-8") as f:
+                threads = [threading.Thread(target=worker, args=(f,)) for _ in range(self.workers)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        except Exception as e:
+            self._set_status(job_id, "failed", error=str(e))
+            return
+        self._set_status(job_id, "succeeded")
+
+    def status(self, job_id):
+        try:
+            with open(os.path.join(self._dir(job_id), "status.json"), encoding="utf-8") as f:
+                status = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return "failed"
+        if status.get("state") == "running" and not self._alive(job_id, status):
+            # the process running the job died (or this is a resumed run), start it over
+            print(f"Restarting local batch {job_id}")
+            try:
+                lines = list(read_records(os.path.join(self._dir(job_id), "input.jsonl")))
+            except (OSError, json.JSONDecodeError):
+                return "failed"
+            self._start(job_id, status.get("model", BATCH_MODEL), lines)
+        return status.get("state", "failed")
+
+    def results(self, job_id):
+        # {"key", "response": {"text"}} or {"key", "error"} per request
+        yield from read_records(os.path.join(self._dir(job_id), "output.jsonl"))
+
+
+# Vertex AI batch prediction through google-genai's `batches` api: the job file is uploaded to
+# gs://<bucket>/<prefix>/<job>/input.jsonl and the predictions are read back from the job's destination.
+# Needs a genai client created with vertexai=True and the google-cloud-storage package.
+class VertexBatchBackend:
+    STATES = {
+        "JOB_STATE_SUCCEEDED": "succeeded",
+        "JOB_STATE_PARTIALLY_SUCCEEDED": "succeeded",
+        "JOB_STATE_FAILED": "failed",
+        "JOB_STATE_CANCELLED": "cancelled",
+        "JOB_STATE_EXPIRED": "expired",
+    }
+
+    def __init__(self, bucket, prefix="batches", client=None):
+        from google.cloud import storage
+
+        self.bucket = storage.Client().bucket(bucket)
+        self.prefix = prefix
+        self.client = client
+
+    def _client(self):
+        return self.client or get_llm()
+
+    def submit(self, path, model):
+        name = f"{self.prefix}/{uuid.uuid4().hex[:12]}"
+        self.bucket.blob(f"{name}/input.jsonl").upload_from_filename(path)
+        job = self._client().batches.create(
+            model=model,
+            src=f"gs://{self.bucket.name}/{name}/input.jsonl",
+            config={"dest": f"gs://{self.bucket.name}/{name}/output", "display_name": name.replace("/", "-")},
+        )
+        return job.name
+
+    def status(self, job_id):
+        state = self._client().batches.get(name=job_id).state
+        state = getattr(state, "value", state)
+        return self.STATES.get(state, "running")
+
+    def results(self, job_id):
+        job = self._client().batches.get(name=job_id)
+        prefix = job.dest.gcs_uri.removeprefix(f"gs://{self.bucket.name}/")
+        for blob in self.bucket.list_blobs(prefix=prefix):
+            if not blob.name.endswith(".jsonl"):
+                continue
+            for line in blob.download_as_text().splitlines():
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                try:
+                    parts = row["response"]["candidates"][0]["content"]["parts"]
+                    yield {"key": row.get("key"), "request": row.get("request"), "response": {"text": parts[0]["text"]}}
+                except (KeyError, IndexError, TypeError):
+                    yield {"key": row.get("key"), "request": row.get("request"), "error": row.get("status") or "no response"}
+
+
+def run_batch(lines, name, backend=None, model=BATCH_MODEL, poll=30, job_dir=BATCH_DIR, timeout=BATCH_TIMEOUT):
+    # Submits the request lines as one job and waits for it, returns {key: parsed json or None}.
+    # The job id is stored under a hash of the job file, a restarted run resumes polling the same job.
+    # Gives up after `timeout` seconds, the job is kept and polled again by the next run
+    backend = backend or get_batch()
+    if not lines:
+        return {}
+    os.makedirs(job_dir, exist_ok=True)
+    digest = make_key(model, lines)[:16]
+    path = os.path.join(job_dir, f"{name}_{digest}.jsonl")
+    job_file = f"{path}.job"
+
+    if os.path.exists(job_file):
+        with open(job_file, encoding="utf-8") as f:
+            job_id = f.read().strip()
+        print(f"Resuming {name} batch {job_id}")
+    else:
+        write_records(path, lines)
+        job_id = backend.submit(path, model)
+        with open(job_file, "w", encoding="utf-8") as f:
+            f.write(job_id)
+        print(f"Submitted {name} batch {job_id} ({len(lines)} requests)")
+
+    deadline = time.monotonic() + timeout
+    with span("batch", stage=name, requests=len(lines)) as record:
+        while (state := backend.status(job_id)) not in DONE_STATES:
+            if time.monotonic() > deadline:
+                record["state"] = "timeout"
+                raise TimeoutError(f"{name} batch {job_id} still {state} after {timeout}s, rerun to resume")
+            time.sleep(poll)
+        record["state"] = state
+    if state != "succeeded":
+        # a failed job is submitted again on the next run
+        os.remove(job_file)
+        raise RuntimeError(f"{name} batch {job_id} {state}")
+
+    # outputs are matched by key, or by the request text when the service drops the key
+    keys_by_text = {make_key(request_text(line)): line["key"] for line in lines}
+    results = {}
+    for row in backend.results(job_id):
+        key = row.get("key") or (row.get("request") and keys_by_text.get(make_key(request_text(row))))
+        if key is None:
+            continue
+        try:
+            results[key] = json.loads(row["response"]["text"]) if "response" in row else None
+        except json.JSONDecodeError:
+            results[key] = None
+        if results[key] is None:
+            print(f"XXXX {key} XXXX - {row.get('error', 'invalid json')}")
+    os.remove(job_file)
+    return results
+
+
+def cached_or_request(key, text, model, lines):
+    # the cached verdict when there is one, otherwise a request line is queued and None returned
+    if (cached := response_cache.get(make_key(model, BATCH_CONFIG, text))) is not None:
+        return cached
+    lines.append(batch_request(key, text))
+    return None
+
+
+def store(results, texts, model):
+    for key, result in results.items():
+        if result is not None:
+            response_cache.set(make_key(model, BATCH_CONFIG, texts[key]), result)
+
+
+def analyze_batch(records, backend=None, model=BATCH_MODEL, poll=30, job_dir=BATCH_DIR, timeout=BATCH_TIMEOUT):
+    # analyze for many apps as two batch jobs: every analyze_* request of every app, then analyze_overall
+    # over their results. Yields {"appId", "url", **results} in the order of `records`
+    apps = {app_data["appId"]: app_data for app_data in records}
+    results = {app_id: {} for app_id in apps}
+    lines, texts = [], {}
+
+    for app_id, app_data in apps.items():
+        for name, prompt in PROMPTS.items():
+            key = f"{app_id}|{name}"
+            if name == "permissions_analysis":
+                index = score_permissions(app_data["permissions"], app_data.get("categoryId"))
+                # same as analyze_permissions, permission sets typical for the category never reach gemini
+                if index["typical"]:
+                    results[app_id][name] = typical_permissions(app_data, index)
+                    continue
+            try:
+                texts[key] = SYSTEM_PROMPT + prompt(app_data)
+            except Exception as e:
+                print(f"XXXX {key} XXXX - {e}")
+                results[app_id][name] = None
+                continue
+            results[app_id][name] = cached_or_request(key, texts[key], model, lines)
+
+    answers = run_batch(lines, "aspects", backend, model, poll, job_dir, timeout)
+    store(answers, texts, model)
+    for key, answer in answers.items():
+        app_id, name = key.split("|")
+        results[app_id][name] = answer
+
+    lines = []
+    for app_id, app_data in apps.items():
+        aspects = {name: results[app_id].get(name) for name in ASPECTS}
+        results[app_id] = aspects
+        key = f"{app_id}|overall_analysis"
+        try:
+            texts[key] = SYSTEM_PROMPT + overall_prompt(aspects, app_data)
+        except Exception as e:
+            print(f"XXXX {key} XXXX - {e}")
+            results[app_id]["overall_analysis"] = None
+            continue
+        results[app_id]["overall_analysis"] = cached_or_request(key, texts[key], model, lines)
+
+    answers = run_batch(lines, "overall", backend, model, poll, job_dir, timeout)
+    store(answers, texts, model)
+    for key, answer in answers.items():
+        results[key.split("|")[0]]["overall_analysis"] = answer
+
+    for app_id, app_data in apps.items():
+        yield {"appId": app_id, "url": app_data.get("url"), **results[app_id]}
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Analyze a dataset with two batch jobs instead of interactive calls")
+    parser.add_argument("path")
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--poll", type=float, default=30, help="seconds between status checks")
+    parser.add_argument("--timeout", type=float, default=BATCH_TIMEOUT, help="seconds to wait for each job")
+    parser.add_argument("--out", default="results/batch_results.jsonl")
+    args = parser.parse_args()
+
+    count = write_records(args.out, analyze_batch(islice(read_records(args.path), args.limit), poll=args.poll, timeout=args.timeout))
+    print(f"Wrote {count} results to {args.out}")
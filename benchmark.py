@@ -0,0 +1,131 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# benchmark runs must neither read nor pollute the real response / blob caches
+if "CACHE_DIR" not in os.environ:
+    os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="fraud-bench-")
+
+import backends  # noqa: E402
+import ratelimit  # noqa: E402
+from data import add_info, get_app_details  # noqa: E402
+from fakes import FakeGemini, FakePlay, FixtureServer  # noqa: E402
+from llm import analyze, response_cache  # noqa: E402
+
+
+def throughput(fn, items, workers):
+    start = time.perf_counter()
+    failures = 0
+
+    def run(item):
+        nonlocal failures
+        try:
+            fn(item)
+        except Exception as e:
+            failures += 1
+            print(f"XXXX {e}")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(run, items))
+    seconds = time.perf_counter() - start
+    # failed calls return fast, only apps that made it through count towards the rate
+    succeeded = len(items) - failures
+    return {
+        "apps": len(items),
+        "failures": failures,
+        "seconds": round(seconds, 2),
+        "appsPerMinute": round(succeeded / seconds * 60, 1) if seconds else None,
+    }
+
+
+def analyze_app(record, **kwargs):
+    # analyze logs failed aspects and returns None for them, an app without a verdict counts as a failure
+    if not analyze(record, **kwargs).get("overall_analysis"):
+        raise ValueError(f"{record['appId']}: no overall analysis")
+
+
+def benchmark(
+    apps=20,
+    latency=0.5,
+    jitter=0.1,
+    error_rate=0.0,
+    play_latency=0.05,
+    workers=4,
+    aspect_workers=5,
+    real_limits=False,
+    prescreen=False,
+):
+    # measures apps/minute of the add_info and analyze paths against the local stand-ins
+    response_cache.enabled = False
+    if not real_limits:
+        for model in ("gemini-2.0-flash", "gemini-2.0-flash-lite"):
+            ratelimit.set_limit(model, 100_000)
+
+    gemini = FakeGemini(latency=latency, jitter=jitter, error_rate=error_rate)
+    backends.set_llm(gemini)
+    play = FakePlay(latency=play_latency)
+    records = list(play.records.values())[:apps]
+
+    with FixtureServer(records, latency=play_latency) as server:
+        play.base_url = server.url
+        backends.set_play(play)
+
+        expanded = []
+        enrich = throughput(lambda app_id: expanded.append(add_info(get_app_details(app_id, filename=None))), [r["appId"] for r in records], workers)
+        enrich_calls = gemini.calls
+
+        analysis = throughput(lambda record: analyze_app(record, max_workers=aspect_workers, prescreen=prescreen), expanded, workers)
+
+    for stage, result in (("add_info", enrich), ("analyze", analysis)):
+        if result["apps"] and result["failures"] == result["apps"]:
+            raise RuntimeError(f"every {stage} call failed, no throughput to report")
+
+    return {
+        "config": {
+            "apps": len(records),
+            "latency": latency,
+            "jitter": jitter,
+            "errorRate": error_rate,
+            "playLatency": play_latency,
+            "workers": workers,
+            "aspectWorkers": aspect_workers,
+            "realLimits": real_limits,
+            "prescreen": prescreen,
+        },
+        "add_info": enrich | {"geminiCalls": enrich_calls},
+        "analyze": analysis | {"geminiCalls": gemini.calls - enrich_calls},
+        "injectedErrors": gemini.errors,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark against local Gemini / Play stand-ins")
+    parser.add_argument("--apps", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per fake gemini call")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of gemini calls failing with 429")
+    parser.add_argument("--play-latency", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=4, help="apps processed concurrently")
+    parser.add_argument("--aspect-workers", type=int, default=5)
+    parser.add_argument("--real-limits", action="store_true", help="keep the configured gemini rate limits")
+    parser.add_argument("--prescreen", action="store_true")
+    parser.add_argument("--out", default="results/benchmark.json")
+    args = parser.parse_args()
+
+    report = benchmark(
+        args.apps,
+        args.latency,
+        args.jitter,
+        args.error_rate,
+        args.play_latency,
+        args.workers,
+        args.aspect_workers,
+        args.real_limits,
+        args.prescreen,
+    )
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,122 @@
+import asyncio
+import atexit
+import threading
+
+from playwright.async_api import async_playwright
+
+# resource types aborted before they are downloaded, we only need the html
+BLOCKED_RESOURCES = ("image", "font", "media")
+
+
+# Keeps one headless chromium warm on a background event loop and opens a fresh page per job,
+# so scraping a url costs a page load instead of a browser launch.
+# Jobs can be submitted from any thread, at most `max_pages` pages are open at once.
+class BrowserPool:
+    def __init__(self, max_pages=4, timeout=15000, block=BLOCKED_RESOURCES):
+        self.max_pages = max_pages
+        self.timeout = timeout
+        self.block = set(block)
+        self.loop = None
+        self.thread = None
+        self.playwright = None
+        self.browser = None
+        self.context = None
+        self.semaphore = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self.loop:
+                return
+            self.loop = asyncio.new_event_loop()
+            self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+            self.thread.start()
+            try:
+                asyncio.run_coroutine_threadsafe(self._launch(), self.loop).result()
+            except Exception:
+                # a failed launch leaves no pool behind, the next job starts over instead of finding a loop without a browser
+                self._shutdown()
+                raise
+
+    async def _launch(self):
+        if not self.playwright:
+            self.playwright = await async_playwright().start()
+            self.semaphore = asyncio.Semaphore(self.max_pages)
+        self.browser = self.context = None
+        browser = await self.playwright.chromium.launch(headless=True)
+        context = await browser.new_context()
+        await context.route("**/*", self._route)
+        self.browser, self.context = browser, context
+
+    async def _route(self, route):
+        if route.request.resource_type in self.block:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _with_page(self, fn, *args):
+        async with self.semaphore:
+            # relaunch if chromium crashed since the last job, or a relaunch failed
+            if self.browser is None or not self.browser.is_connected():
+                await self._launch()
+            page = await self.context.new_page()
+            page.set_default_timeout(self.timeout)
+            try:
+                return await fn(page, *args)
+            finally:
+                await page.close()
+
+    def submit(self, fn, *args):
+        # schedule `await fn(page, *args)` on a pooled page, returns a concurrent.futures.Future
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self._with_page(fn, *args), self.loop)
+
+    def run(self, fn, *args, timeout=None):
+        return self.submit(fn, *args).result(timeout)
+
+    def content(self, url):
+        return self.run(page_content, url, timeout=self.timeout / 1000 * 2)
+
+    def content_many(self, urls):
+        # scrape many urls concurrently in separate pages, failed urls map to ""
+        futures = {url: self.submit(page_content, url) for url in dict.fromkeys(urls)}
+        results = {}
+        for url, future in futures.items():
+            try:
+                results[url] = future.result(self.timeout / 1000 * 2)
+            except Exception as e:
+                print(f"Error scraping {url}: {e}")
+                results[url] = ""
+        return results
+
+    async def _close(self):
+        if self.browser:
+            await self.browser.close()
+        if self.playwright:
+            await self.playwright.stop()
+
+    def _shutdown(self):
+        # callers hold self._lock
+        try:
+            asyncio.run_coroutine_threadsafe(self._close(), self.loop).result(10)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+        self.loop = self.thread = self.playwright = self.browser = self.context = self.semaphore = None
+
+    def close(self):
+        with self._lock:
+            if not self.loop:
+                return
+            self._shutdown()
+
+
+async def page_content(page, url):
+    await page.goto(url)
+    await page.wait_for_selector("body")
+    return await page.content()
+
+
+pool = BrowserPool()
+atexit.register(pool.close)
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+
+
+def make_key(*parts):
+    # content-addressed key, bytes are hashed as-is and everything else as canonical json
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, bytes):
+            h.update(part)
+        else:
+            h.update(json.dumps(part, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+# Persistent json cache with a ttl and size-based LRU eviction.
+# Entries live in `path/<key[:2]>/<key>.json`, the file mtime is bumped on every hit
+# so eviction drops the least recently used entries first.
+# `enabled=False` bypasses the cache, `refresh=True` ignores stored entries but still writes new ones.
+class DiskCache:
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, ttl=30 * 24 * 3600, enabled=True, refresh=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.enabled = enabled
+        self.refresh = refresh
+        self._size = None
+        self._lock = threading.Lock()
+
+    def _file(self, key):
+        return os.path.join(self.path, key[:2], f"{key}.json")
+
+    def get(self, key, default=None):
+        if not self.enabled or self.refresh:
+            return default
+        file = self._file(key)
+        try:
+            with open(file, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return default
+
+        if self.ttl and time.time() - entry["created"] > self.ttl:
+            self.delete(key)
+            return default
+        try:
+            os.utime(file)
+        except OSError:
+            pass
+        return entry["value"]
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        file = self._file(key)
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        data = json.dumps({"created": time.time(), "value": value}, ensure_ascii=False, default=str)
+        tmp = f"{file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        # an overwritten entry (refresh) gives its size back
+        try:
+            replaced = os.path.getsize(file)
+        except OSError:
+            replaced = 0
+        os.replace(tmp, file)
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, _, size in self._entries())
+            else:
+                self._size += len(data.encode("utf-8")) - replaced
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def delete(self, key):
+        try:
+            os.remove(self._file(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for file, _, _ in self._entries():
+            try:
+                os.remove(file)
+            except OSError:
+                pass
+        self._size = 0
+
+    def _entries(self):
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                file = os.path.join(root, name)
+                try:
+                    stat = os.stat(file)
+                except OSError:
+                    continue
+                yield file, stat.st_mtime, stat.st_size
+
+    def _evict(self):
+        # drop least recently used entries until we are back under 90% of the budget
+        entries = sorted(self._entries(), key=lambda e: e[1])
+        total = sum(size for _, _, size in entries)
+        target = self.max_bytes * 0.9
+        for file, _, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(file)
+                total -= size
+            except OSError:
+                pass
+        self._size = total
@@ -0,0 +1,85 @@
+import json
+import os
+import threading
+import time
+
+
+# Append-only jsonl checkpoint log keyed by (appId, stage), e.g. stages "details", "add_info", "analyze".
+# Every attempt appends a line {"appId", "stage", "status", "data"|"error", "time"} and the last line
+# for a key wins, so a crashed run can be restarted and will skip work that already succeeded.
+# Only the byte offset of each line is kept in memory, records are read back from disk on demand.
+class Checkpoint:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r+b") as f:
+            offset = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # the last line was cut short by a crash, it is dropped so the next append starts on a
+                    # line of its own instead of being glued to the fragment. The stage gets retried
+                    f.truncate(offset)
+                    break
+                try:
+                    entry = json.loads(line)
+                    self.entries[(entry["appId"], entry["stage"])] = (entry["status"], offset)
+                except (json.JSONDecodeError, KeyError):
+                    # a corrupt line, it gets retried
+                    pass
+                offset += len(line)
+
+    def _append(self, app_id, stage, status, **fields):
+        entry = {"appId": app_id, "stage": stage, "status": status, "time": time.time(), **fields}
+        line = (json.dumps(entry, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        with self._lock, open(self.path, "ab") as f:
+            offset = f.tell()
+            f.write(line)
+            self.entries[(app_id, stage)] = (status, offset)
+
+    def status(self, app_id, stage):
+        return self.entries.get((app_id, stage), (None, None))[0]
+
+    def done(self, app_id, stage):
+        return self.status(app_id, stage) == "ok"
+
+    def get(self, app_id, stage):
+        status, offset = self.entries.get((app_id, stage), (None, None))
+        if status != "ok":
+            return None
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline())["data"]
+
+    def save(self, app_id, stage, data):
+        self._append(app_id, stage, "ok", data=data)
+
+    def fail(self, app_id, stage, error):
+        self._append(app_id, stage, "error", error=str(error))
+
+    def completed(self, stage):
+        return [app_id for (app_id, s), (status, _) in self.entries.items() if s == stage and status == "ok"]
+
+    def failed(self, stage):
+        return [app_id for (app_id, s), (status, _) in self.entries.items() if s == stage and status == "error"]
+
+    def run(self, app_id, stage, fn, *args, **kwargs):
+        # returns the stored result if the stage already succeeded, otherwise runs fn and records the outcome.
+        # failures are logged and return None, they are retried on the next run
+        if self.done(app_id, stage):
+            return self.get(app_id, stage)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            print(f"XXXX {app_id} {stage} XXXX - {e}")
+            self.fail(app_id, stage, e)
+            return None
+        self.save(app_id, stage, result)
+        return result
@@ -0,0 +1,111 @@
+import argparse
+import hashlib
+import multiprocessing
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, product
+
+from checkpoint import Checkpoint
+from data import add_info, get_app_details
+from play_scraper import get_category_apps
+from ratelimit import scale_limits
+from records import read_records, write_records
+
+CRAWL_DIR = "dataset/crawl"
+# fixed, independent of --processes, so every app keeps its shard checkpoint when the pool size changes.
+# The shards are queued on the pool, each process works through several of them
+SHARDS = 64
+
+
+def init_worker(processes):
+    # every process has its own limiters, together they stay inside the quotas of the shared api keys
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    scale_limits(1 / processes)
+
+
+def discover(category, country):
+    # same checkpoint as create_category_dataset, pairs discovered by either are not crawled again
+    checkpoint = Checkpoint(f"dataset/checkpoint_{category}_{country}.jsonl")
+    return checkpoint.run(f"{category}_{country}", "discover", get_category_apps, category, country) or []
+
+
+def shard_of(app_id, shards=SHARDS):
+    # stable across runs, so a restarted crawl finds each app in the same shard checkpoint
+    return int(hashlib.sha256(app_id.encode("utf-8")).hexdigest(), 16) % shards
+
+
+def crawl_shard(index, apps, info=True, out_dir=CRAWL_DIR):
+    # details (+ add_info) for one shard's apps, {appId: ["CATEGORY_COUNTRY", ...]}, written to its own jsonl
+    checkpoint = Checkpoint(os.path.join(out_dir, f"checkpoint_shard{index}.jsonl"))
+
+    def records():
+        for i, (app_id, pairs) in enumerate(apps.items()):
+            print(f"-----shard {index}: {i}/{len(apps)}-----")
+            details = checkpoint.run(app_id, "details", get_app_details, app_id, filename=None)
+            if details is not None and info:
+                details = checkpoint.run(app_id, "add_info", add_info, details)
+            if details is not None:
+                yield details | {"discoveredIn": pairs}
+
+    path = os.path.join(out_dir, f"shard{index}.jsonl")
+    return path, write_records(path, records())
+
+
+def crawl(matrix, processes=None, out="dataset/crawl.jsonl", info=True, out_dir=CRAWL_DIR):
+    # Crawls every (category, country) pair of `matrix` on a pool of worker processes:
+    # the pairs are discovered in parallel, app ids found in several pairs are kept once,
+    # the unique ids are sharded by hash into SHARDS shards run on the pool, every shard streams to its own file.
+    # The shards are merged into `out` at the end, returns its path.
+    processes = processes or os.cpu_count() or 1
+    os.makedirs(out_dir, exist_ok=True)
+    # spawn, the parent may already run browser / executor threads that fork would copy half-way
+    context = multiprocessing.get_context("spawn")
+
+    with ProcessPoolExecutor(processes, mp_context=context, initializer=init_worker, initargs=(processes,)) as executor:
+        futures = {pair: executor.submit(discover, *pair) for pair in matrix}
+        apps = defaultdict(list)
+        for (category, country), future in futures.items():
+            try:
+                app_ids = future.result()
+            except Exception as e:
+                print(f"XXXX discover {category} {country} XXXX - {e}")
+                continue
+            for app_id in app_ids:
+                apps[app_id].append(f"{category}_{country}")
+
+        found = sum(len(pairs) for pairs in apps.values())
+        print(f"{len(matrix)} pairs, {found} app ids, {len(apps)} unique")
+
+        shards = [{} for _ in range(SHARDS)]
+        for app_id, pairs in apps.items():
+            shards[shard_of(app_id)][app_id] = pairs
+        futures = [executor.submit(crawl_shard, index, shard, info, out_dir) for index, shard in enumerate(shards) if shard]
+
+        paths = []
+        for future in futures:
+            try:
+                path, count = future.result()
+            except Exception as e:
+                print(f"XXXX shard XXXX - {e}")
+                continue
+            print(f"{path}: {count} records")
+            paths.append(path)
+
+    count = write_records(out, chain.from_iterable(read_records(path) for path in paths))
+    print(f"Wrote {count} records to {out}")
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl a matrix of play store categories x countries on worker processes")
+    parser.add_argument("--categories", nargs="+", required=True)
+    parser.add_argument("--countries", nargs="+", required=True)
+    parser.add_argument("--processes", type=int, help="worker processes, defaults to the cpu count")
+    parser.add_argument("--out", default="dataset/crawl.jsonl")
+    parser.add_argument("--no-info", action="store_true", help="only app details, skip add_info")
+    args = parser.parse_args()
+
+    crawl(list(product(args.categories, args.countries)), args.processes, args.out, not args.no_info)
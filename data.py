@@ -1,61 +1,77 @@
 import json
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 
-from google_play_scraper import Sort, app, permissions, reviews, search
+from google_play_scraper import Sort
 
+from backends import get_play
+from developers import developer_registry
+from image_hash import screenshot_index
 from llm import describe_screenshots
-from utils import scrape, validate_email
+from tracing import span, submit, traced
 
 
 def search_apps(query, country="us"):
-    results = search(query, n_hits=10, country=country)
+    results = get_play().search(query, n_hits=10, country=country)
     package_names = [app["appId"] for app in results]
     return package_names
 
 
-def get_reviews(app_id, num=100):
-    new_reviews, _ = reviews(
-        app_id,
-        count=num // 4,
-        sort=Sort.NEWEST,
-        filter_score_with=None,
-        lang="en",
-        country="us",
-    )
-    relevant_reviews, _ = reviews(
+REVIEW_KEYS = ("userName", "content", "score", "thumbsUpCount")
+
+
+@traced()
+def fetch_reviews(app_id, count, sort=Sort.NEWEST, score=None):
+    result, _ = get_play().reviews(
         app_id,
-        count=num // 4,
-        sort=Sort.MOST_RELEVANT,
-        filter_score_with=None,
+        count=count,
+        sort=sort,
+        filter_score_with=score,
         lang="en",
         country="us",
     )
-    balanced_reviews = get_balanced_reviews(app_id, num_per_rating=num // 10)
-    all_reviews = [*new_reviews, *relevant_reviews, *balanced_reviews]
-    keys = ("userName", "content", "score", "thumbsUpCount")
-    all_reviews = [{k: review.get(k) for k in keys} for review in all_reviews]
-
-    return all_reviews
+    return result
+
+
+@traced()
+def get_reviews(app_id, num=100, newest=None, relevant=None, per_rating=None, max_workers=7):
+    # newest, most relevant and one newest-per-star source, fetched concurrently
+    newest = num // 4 if newest is None else newest
+    relevant = num // 4 if relevant is None else relevant
+    per_rating = num // 10 if per_rating is None else per_rating
+    sources = [
+        (newest, Sort.NEWEST, None),
+        (relevant, Sort.MOST_RELEVANT, None),
+        *[(per_rating, Sort.NEWEST, rating) for rating in range(1, 6)],
+    ]
+    sources = [source for source in sources if source[0]]
 
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [submit(executor, fetch_reviews, app_id, *source) for source in sources]
+        batches = [future.result() for future in futures]
 
-def get_balanced_reviews(app_id, num_per_rating=10):
+    # the sources overlap (newest 5-star reviews are also the newest reviews), keep each review once
+    seen = set()
     all_reviews = []
-
-    for rating in range(1, 6):  # Loop through ratings 1 to 5
-        rating_reviews, _ = reviews(
-            app_id,
-            count=num_per_rating,
-            sort=Sort.NEWEST,
-            filter_score_with=rating,
-            lang="en",
-            country="us",
-        )
-        all_reviews.extend(rating_reviews)
+    for review in chain.from_iterable(batches):
+        review_id = review.get("reviewId") or (review.get("userName"), review.get("content"))
+        if review_id in seen:
+            continue
+        seen.add(review_id)
+        all_reviews.append({k: review.get(k) for k in REVIEW_KEYS})
 
     return all_reviews
 
 
-def get_app_details(app_id):
-    details = app(app_id)
+def get_balanced_reviews(app_id, num_per_rating=10, max_workers=5):
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [submit(executor, fetch_reviews, app_id, num_per_rating, score=rating) for rating in range(1, 6)]
+        return list(chain.from_iterable(future.result() for future in futures))
+
+
+@traced()
+def get_app_details(app_id, filename="app_details.json"):
+    details = get_play().app(app_id)
     ads1 = details.pop("containsAds")
     ads2 = details.pop("adSupported")
     app_info = {
@@ -129,27 +145,66 @@ def get_app_details(app_id):
         "extra": details,
     }
 
-    with open("app_details.json", "w", encoding="utf-8") as f:
-        json.dump(app_info, f, indent=4, ensure_ascii=False, default=str)
+    if filename:
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(app_info, f, indent=4, ensure_ascii=False, default=str)
 
     return app_info
 
 
-def add_info(details):
-    details = describe_screenshots(details)
+def get_permissions(app_id):
     try:
-        perms = permissions(details["appId"])
+        with span("permissions"):
+            return get_play().permissions(app_id)
     except Exception:
-        perms = {}
+        return {}
+
+
+@traced()
+def add_info(details):
+    details = describe_screenshots(details)
     new = {
-        "permissions": perms,
+        "permissions": get_permissions(details["appId"]),
         "reviews": get_reviews(details["appId"]),
     }
-    if valid_email := validate_email(details["developer"]["email"]):
-        new["emailValid"] = valid_email
-    if details["developer"].get("website", "N/A") != "N/A":
-        new["websiteContent"] = scrape(details["developer"]["website"])
-    return details | new
+    # shared with the developer's other apps, see developers.DeveloperRegistry
+    return details | new | developer_registry.info(details["developer"])
+
+
+def screenshot_urls(details):
+    # the listing's screenshot urls, before or after describe_screenshots replaced them with descriptions
+    media = details["media"]
+    return list(media["screenshots"]) + list(media.get("other_screenshots", []))
+
+
+@traced()
+def update_info(details, previous):
+    # add_info for an app enriched before, only the parts whose cheap metadata changed are fetched again:
+    # screenshots are re-described when the urls change, permissions when a new version is out,
+    # reviews when the review count moved and the website / email when the developer details changed
+    if screenshot_urls(details) == screenshot_urls(previous):
+        details["media"] |= {k: previous["media"][k] for k in ("screenshots", "other_screenshots") if k in previous["media"]}
+        # apps crawled since may have picked up the same screenshots
+        details["sharedScreenshots"] = screenshot_index.shared_with(details["appId"])
+    else:
+        details = describe_screenshots(details)
+
+    if details["version"] == previous["version"] and "permissions" in previous:
+        permissions = previous["permissions"]
+    else:
+        permissions = get_permissions(details["appId"])
+
+    if details["metrics"]["reviews"] == previous["metrics"]["reviews"] and "reviews" in previous:
+        reviews = previous["reviews"]
+    else:
+        reviews = get_reviews(details["appId"])
+
+    if details["developer"] == previous["developer"]:
+        developer = {k: previous[k] for k in ("emailValid", "websiteContent") if k in previous}
+    else:
+        developer = developer_registry.info(details["developer"])
+
+    return details | {"permissions": permissions, "reviews": reviews} | developer
 
 
 if __name__ == "__main__":
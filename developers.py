@@ -0,0 +1,83 @@
+import argparse
+import os
+import threading
+from collections import defaultdict
+
+from cache import CACHE_DIR, DiskCache, make_key
+from records import read_records
+from tracing import span
+from utils import scrape, validate_email
+
+# website content and email checks are shared by every app of a developer for this long
+DEVELOPER_TTL = int(os.getenv("DEVELOPER_TTL_DAYS", "7")) * 24 * 3600
+LOCK_STRIPES = 64
+
+
+# Per-developer results keyed by developer.id, stored on disk with a ttl so big publishers with dozens of
+# apps in a category get their website scraped, their email validated and (optionally) their developer
+# analysis run once. The fields a result depends on (website, email) are part of its key, so a developer
+# changing them, or an app listing a different support email, is looked up again.
+# Concurrent lookups for the same key wait for the first one instead of doing the work twice, keys share
+# a fixed set of LOCK_STRIPES locks so the lock table does not grow with every developer seen.
+class DeveloperRegistry:
+    def __init__(self, path=os.path.join(CACHE_DIR, "developers"), ttl=DEVELOPER_TTL, enabled=True, refresh=False):
+        self.cache = DiskCache(path, ttl=ttl, enabled=enabled, refresh=refresh)
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+    def key(self, kind, developer, fields=(), extra=()):
+        # `extra` are other inputs the result depends on, e.g. the scraped website content
+        return make_key(
+            kind, developer.get("id") or developer.get("name"), *[developer.get(field) for field in fields], *extra
+        )
+
+    def get(self, kind, developer, fn, fields=(), extra=()):
+        # fn(developer) runs once per key and ttl, None results are not stored so failures are retried
+        key = self.key(kind, developer, fields, extra)
+        with self._locks[int(key[:8], 16) % LOCK_STRIPES]:
+            if (cached := self.cache.get(key)) is not None:
+                with span("developer_hit", kind=kind):
+                    return cached
+            value = fn(developer)
+            if value is not None:
+                self.cache.set(key, value)
+            return value
+
+    def info(self, developer):
+        # the emailValid / websiteContent fields add_info puts on an app
+        # failed (empty) lookups are not stored, the next app of the developer tries again
+        info = {}
+        if valid_email := self.get("email", developer, lambda d: validate_email(d["email"]) or None, fields=("email",)):
+            info["emailValid"] = valid_email
+        if developer.get("website", "N/A") != "N/A":
+            content = self.get("website", developer, lambda d: scrape(d["website"]) or None, fields=("website",))
+            info["websiteContent"] = content or ""
+        return info
+
+
+# DEVELOPER_CACHE=off looks every developer up again, DEVELOPER_CACHE=refresh re-does and overwrites them
+developer_registry = DeveloperRegistry(
+    enabled=os.getenv("DEVELOPER_CACHE", "on") != "off",
+    refresh=os.getenv("DEVELOPER_CACHE", "on") == "refresh",
+)
+
+
+def developer_apps(records):
+    # {developer id: [appId, ...]}, shows how much a dataset gains from sharing developer work
+    apps = defaultdict(list)
+    for record in records:
+        developer = record.get("developer", {})
+        apps[developer.get("id") or developer.get("name")].append(record["appId"])
+    return dict(apps)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Count the developers of a dataset and the apps sharing them")
+    parser.add_argument("path")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    apps = developer_apps(read_records(args.path))
+    total = sum(len(ids) for ids in apps.values())
+    print(f"{total} apps, {len(apps)} developers, {total - len(apps)} developer lookups saved")
+    for developer, ids in sorted(apps.items(), key=lambda item: len(item[1]), reverse=True)[: args.top]:
+        print(f"{len(ids):4d}  {developer}")
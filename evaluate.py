@@ -0,0 +1,154 @@
+import argparse
+import json
+import time
+from collections import Counter, defaultdict
+from contextlib import nullcontext
+from itertools import islice
+
+import numpy as np
+
+from llm import ASPECTS, MODES, analyze
+from records import read_records, write_records
+from tracing import collect, trace
+
+DATASETS = {
+    "fraud": "dataset/fraud-expanded.json",
+    "genuine": "dataset/genuine-expanded.json",
+}
+PREDICTIONS = ("fraud", "genuine", "suspected", "error")
+
+
+def verdict(result):
+    # review_analysis sometimes comes back as a list of verdicts, take the majority
+    if isinstance(result, list):
+        types = [r.get("type") for r in result if isinstance(r, dict)]
+        return Counter(types).most_common(1)[0][0] if types else "error"
+    if isinstance(result, dict) and result.get("type") in PREDICTIONS:
+        return result["type"]
+    return "error"
+
+
+def evaluate_app(record, label, **kwargs):
+    with collect() as spans:
+        start = time.perf_counter()
+        try:
+            result = analyze(record, **kwargs)
+        except Exception as e:
+            print(f"XXXX {record.get('appId')} XXXX - {e}")
+            result = {}
+        duration = time.perf_counter() - start
+
+    calls = [s for s in spans if s["name"] == "gemini"]
+    return {
+        "appId": record.get("appId"),
+        "label": label,
+        "prediction": verdict(result.get("overall_analysis")),
+        "aspects": {name: verdict(result[name]) for name in ASPECTS if name in result},
+        "prescreened": "prescreen" in result,
+        "duration": duration,
+        "spans": [{"name": s["name"], "duration": s["duration"]} for s in spans],
+        "calls": len(calls),
+        "cacheHits": sum(s["name"] == "cache_hit" for s in spans),
+        "promptTokens": sum(s.get("promptTokens", 0) for s in calls),
+        "outputTokens": sum(s.get("outputTokens", 0) for s in calls),
+    }
+
+
+def percentiles(values):
+    if not values:
+        return {"p50": None, "p95": None, "mean": None}
+    values = np.asarray(values, dtype=float)
+    return {
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p95": round(float(np.percentile(values, 95)), 3),
+        "mean": round(float(values.mean()), 3),
+    }
+
+
+def summarize(rows):
+    labels = sorted({row["label"] for row in rows})
+    confusion = {label: {p: 0 for p in PREDICTIONS} for label in labels}
+    for row in rows:
+        confusion[row["label"]][row["prediction"]] += 1
+
+    def accuracy(key):
+        scored = [row for row in rows if key(row) is not None]
+        return round(sum(key(row) == row["label"] for row in scored) / len(scored), 3) if scored else None
+
+    aspect_accuracy = {name: accuracy(lambda row, name=name: row["aspects"].get(name)) for name in ASPECTS}
+
+    durations = defaultdict(list)
+    for row in rows:
+        for s in row["spans"]:
+            durations[s["name"]].append(s["duration"])
+
+    n = len(rows)
+    return {
+        "apps": n,
+        "confusion": confusion,
+        "accuracy": accuracy(lambda row: row["prediction"]),
+        # counting suspected as fraud, the usual reading when suspected apps get a manual review
+        "accuracySuspectedAsFraud": accuracy(lambda row: "fraud" if row["prediction"] == "suspected" else row["prediction"]),
+        "suspectedRate": round(sum(row["prediction"] == "suspected" for row in rows) / n, 3) if n else None,
+        "errorRate": round(sum(row["prediction"] == "error" for row in rows) / n, 3) if n else None,
+        "prescreenedRate": round(sum(row["prescreened"] for row in rows) / n, 3) if n else None,
+        "aspectAccuracy": aspect_accuracy,
+        "latency": {"app": percentiles([row["duration"] for row in rows])}
+        | {name: percentiles(values) for name, values in sorted(durations.items())},
+        "perApp": {
+            "calls": percentiles([row["calls"] for row in rows]),
+            "cacheHits": percentiles([row["cacheHits"] for row in rows]),
+            "promptTokens": percentiles([row["promptTokens"] for row in rows]),
+            "outputTokens": percentiles([row["outputTokens"] for row in rows]),
+        },
+        "totals": {
+            "calls": sum(row["calls"] for row in rows),
+            "promptTokens": sum(row["promptTokens"] for row in rows),
+            "outputTokens": sum(row["outputTokens"] for row in rows),
+        },
+    }
+
+
+def evaluate(datasets=DATASETS, limit=None, out="results/evaluation.json", **kwargs):
+    # runs analyze over the labeled datasets and writes per-app rows plus the summary report
+    rows = []
+    for label, path in datasets.items():
+        for i, record in enumerate(islice(read_records(path), limit)):
+            print(f"-----{label} {i}-----")
+            rows.append(evaluate_app(record, label, **kwargs))
+
+    # the analyze options go into the report, so runs of different modes can be told apart
+    report = {"settings": kwargs} | summarize(rows)
+    write_records(out.removesuffix(".json") + "_rows.jsonl", rows)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Evaluate the pipeline against the labeled datasets")
+    parser.add_argument("--fraud", default=DATASETS["fraud"])
+    parser.add_argument("--genuine", default=DATASETS["genuine"])
+    parser.add_argument("--limit", type=int, help="apps per dataset")
+    parser.add_argument("--workers", type=int, default=5, help="concurrent aspect calls per app")
+    parser.add_argument("--prescreen", action="store_true")
+    parser.add_argument("--mode", choices=MODES, default="multi", help="combined: one gemini call per app")
+    parser.add_argument("--per-developer", action="store_true", help="one developer analysis per developer")
+    parser.add_argument("--out", default="results/evaluation.json")
+    parser.add_argument("--trace", help="append every span to this jsonl file and print a summary table")
+    args = parser.parse_args()
+
+    with trace(args.trace) if args.trace else nullcontext():
+        report = evaluate(
+            {"fraud": args.fraud, "genuine": args.genuine},
+            limit=args.limit,
+            out=args.out,
+            max_workers=args.workers,
+            prescreen=args.prescreen,
+            per_developer=args.per_developer,
+            mode=args.mode,
+        )
+    print(json.dumps({k: report[k] for k in ("confusion", "accuracy", "suspectedRate", "aspectAccuracy", "perApp")}, indent=2))
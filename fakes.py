@@ -0,0 +1,280 @@
+import hashlib
+import json
+import random
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+from records import read_records
+
+# Deterministic local stand-ins for every live service, for benchmarks and offline regression runs:
+# FakeGemini for the genai client, FakePlay for google_play_scraper and FixtureServer for developer
+# websites and screenshot downloads. Install them with backends.set_llm / backends.set_play.
+
+VERDICTS = ("fraud", "genuine", "suspected")
+FIXTURES = ("dataset/fraud-expanded.json", "dataset/genuine-expanded.json", "sample/app_details.json")
+
+
+class FakeAPIError(Exception):
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+def prompt_text(contents):
+    # flatten generate_content `contents` into its text, images become placeholders
+    parts = []
+    for item in contents if isinstance(contents, list) else [contents]:
+        if isinstance(item, str):
+            parts.append(item)
+        elif isinstance(item, dict):
+            parts += [part.get("text", "") for part in item.get("parts", [])]
+        elif getattr(item, "inline_data", None) is not None:
+            parts.append("<image>")
+    return "\n".join(parts)
+
+
+def stub_from_schema(schema, seed, count=1):
+    # smallest value that satisfies a genai response schema, choices are derived from `seed`
+    kind = schema.get("type", "STRING").upper()
+    if schema.get("enum"):
+        return schema["enum"][seed % len(schema["enum"])]
+    if kind == "OBJECT":
+        return {name: stub_from_schema(prop, seed + i) for i, (name, prop) in enumerate(schema.get("properties", {}).items())}
+    if kind == "ARRAY":
+        return [stub_from_schema(schema.get("items", {}), seed + i) for i in range(count)]
+    if kind in ("INTEGER", "NUMBER"):
+        return 0
+    if kind == "BOOLEAN":
+        return bool(seed % 2)
+    return "Stub response"
+
+
+class FakeModels:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def generate_content(self, model, contents, config=None):
+        return self.owner.generate(model, contents, config or {})
+
+
+# Stub / replay gemini client. Replies are deterministic per prompt: recorded replies (keyed by the
+# sha256 of the prompt text) are replayed when present, otherwise a stub matching the requested format
+# is generated. `latency` seconds (+- `jitter`) are spent per call and `error_rate` of calls raise a 429.
+class FakeGemini:
+    def __init__(self, latency=0.5, jitter=0.0, error_rate=0.0, responses=None, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.responses = responses or {}
+        self.models = FakeModels(self)
+        self.calls = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_jsonl(cls, path, **kwargs):
+        # lines of {"prompt": ..., "text": ...} or {"promptHash": ..., "text": ...}
+        responses = {}
+        for record in read_records(path):
+            key = record.get("promptHash") or hashlib.sha256(record["prompt"].encode("utf-8")).hexdigest()
+            responses[key] = record["text"]
+        return cls(responses=responses, **kwargs)
+
+    def generate(self, model, contents, config):
+        with self._lock:
+            self.calls += 1
+            delay = max(self.latency + self._random.uniform(-self.jitter, self.jitter), 0)
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        time.sleep(delay)
+        if fail:
+            raise FakeAPIError(429, "RESOURCE_EXHAUSTED (injected by FakeGemini)")
+
+        config = dict(config) if isinstance(config, dict) else vars(config)
+        text = prompt_text(contents)
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        seed = int(digest[:8], 16)
+        images = text.count("<image>")
+
+        if digest in self.responses:
+            output = self.responses[digest]
+        elif config.get("response_schema") and images:
+            output = json.dumps([{"index": i, "description": f"Stub screenshot {i} of the app."} for i in range(images)])
+        elif config.get("response_schema"):
+            output = json.dumps(stub_from_schema(config["response_schema"], seed))
+        elif config.get("response_mime_type") == "application/json":
+            output = json.dumps({"type": VERDICTS[seed % 3], "reason": f"Stub verdict for prompt {digest[:8]}."})
+        else:
+            output = f"Stub description of image {digest[:8]}."
+
+        usage = SimpleNamespace(prompt_token_count=len(text) // 4 + 258 * images, candidates_token_count=len(output) // 4)
+        return SimpleNamespace(text=output, usage_metadata=usage)
+
+
+def raw_app(record, base_url=None):
+    # turns a processed dataset record back into the dict google_play_scraper.app returns
+    developer = record.get("developer", {})
+    metrics = record.get("metrics", {})
+    ratings = metrics.get("ratings", {})
+    dist = ratings.get("distribution") or {}
+    installs = metrics.get("installs", {})
+    screenshots = list(record.get("media", {}).get("screenshots") or [])
+    website = developer.get("website", "N/A")
+    if base_url:
+        screenshots = [f"{base_url}/img/{record['appId']}/{i}.png" for i in range(len(screenshots))]
+        website = f"{base_url}/site/{record['appId']}"
+    version = record.get("version", {})
+
+    return {
+        "appId": record["appId"],
+        "categories": record.get("categories", []),
+        "genre": record.get("category"),
+        "genreId": record.get("categoryId"),
+        "contentRating": record.get("contentRating"),
+        "contentRatingDescription": record.get("contentRatingDescription", "N/A"),
+        "currency": record.get("currency", "N/A"),
+        "description": record.get("description", ""),
+        "developer": developer.get("name"),
+        "developerId": developer.get("id"),
+        "developerEmail": developer.get("email", "N/A"),
+        "privacyPolicy": developer.get("privacyPolicy", "N/A"),
+        "developerWebsite": website,
+        "developerAddress": developer.get("legalAddress", "N/A"),
+        "containsAds": record.get("features", {}).get("hasAds", False),
+        "adSupported": record.get("features", {}).get("hasAds", False),
+        "offersIAP": record.get("hasInAppPurchases", False),
+        "inAppProductPrice": record.get("inAppProductPrice", "N/A"),
+        "headerImage": record.get("headerImage", ""),
+        "icon": record.get("icon", ""),
+        "free": record.get("isFree", True),
+        "screenshots": screenshots,
+        "video": record.get("media", {}).get("video"),
+        "videoImage": record.get("media", {}).get("videoImage"),
+        "score": ratings.get("average", 0),
+        "ratings": ratings.get("total", 0),
+        "histogram": [dist.get(star, dist.get(str(star), 0)) for star in range(1, 6)],
+        "reviews": metrics.get("reviews", 0),
+        "installs": installs.get("text", "0+"),
+        "minInstalls": installs.get("min", 0),
+        "realInstalls": installs.get("max", 0),
+        "price": record.get("price", 0),
+        "priceText": record.get("priceText", "Free"),
+        "summary": record.get("summary", ""),
+        "title": record.get("title", ""),
+        "url": record.get("url", ""),
+        "version": version.get("number", "N/A"),
+        "released": version.get("released", "N/A"),
+        "updated": version.get("updated", "N/A"),
+        "lastUpdatedOn": version.get("lastUpdated", "N/A"),
+        "comments": record.get("comments", []),
+    }
+
+
+# google_play_scraper stand-in serving app details, reviews, permissions and search from dataset fixtures.
+# With `base_url` (a FixtureServer) screenshots and developer websites point at the local server.
+class FakePlay:
+    def __init__(self, paths=FIXTURES, base_url=None, latency=0.0):
+        self.records = {}
+        for path in paths:
+            for record in read_records(path):
+                self.records[record["appId"]] = record
+        self.base_url = base_url
+        self.latency = latency
+
+    def _record(self, app_id):
+        time.sleep(self.latency)
+        if app_id not in self.records:
+            raise LookupError(f"App not found (404) - {app_id}")
+        return self.records[app_id]
+
+    def app(self, app_id, lang="en", country="us"):
+        return raw_app(self._record(app_id), self.base_url)
+
+    def reviews(self, app_id, count=100, sort=None, filter_score_with=None, lang="en", country="us", continuation_token=None):
+        found = []
+        for review in self._record(app_id).get("reviews") or []:
+            if filter_score_with is None or review.get("score") == filter_score_with:
+                key = f"{review.get('userName')}|{review.get('content')}".encode("utf-8")
+                found.append(review | {"reviewId": hashlib.sha256(key).hexdigest()[:16]})
+        return found[:count], None
+
+    def permissions(self, app_id, lang="en", country="us"):
+        return self._record(app_id).get("permissions") or {}
+
+    def search(self, query, n_hits=30, lang="en", country="us"):
+        time.sleep(self.latency)
+        query = query.lower()
+        hits = [r for r in self.records.values() if query in f"{r.get('title')} {r.get('categoryId')}".lower()]
+        return [{"appId": r["appId"], "title": r.get("title")} for r in hits[:n_hits]]
+
+
+def tiny_png(seed):
+    # valid 1x1 png whose colour depends on the seed, so every url gets distinct bytes
+    color = hashlib.sha256(seed.encode("utf-8")).digest()[:3]
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", 1, 1, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(b"\x00" + color)) + chunk(b"IEND", b"")
+
+
+# Local http server for the scraping paths: /site/<appId> serves the app's stored website content as html
+# and /img/<anything> serves a tiny png. Use as a context manager or call start() / close().
+class FixtureServer:
+    def __init__(self, records=(), latency=0.0):
+        self.pages = {r["appId"]: r.get("websiteContent") or r.get("description", "") for r in records}
+        self.latency = latency
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        pages, latency = self.pages, self.latency
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(latency)
+                if self.path.startswith("/img/"):
+                    body, kind = tiny_png(self.path), "image/png"
+                elif self.path.startswith("/site/") and (app_id := self.path[len("/site/") :]) in pages:
+                    body, kind = f"<html><body><p>{pages[app_id]}</p></body></html>".encode("utf-8"), "text/html"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", kind)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", hashlib.sha256(body).hexdigest()[:16])
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from cache import CACHE_DIR
+from tracing import submit, traced
+
+BLOB_DIR = os.path.join(CACHE_DIR, "blobs")
+# (connect, read) timeouts in seconds
+TIMEOUT = (5, 30)
+
+
+def make_session(pool_size=32):
+    # one keep-alive pool shared by every download, the play cdn serves everything from a couple of hosts
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+session = make_session()
+
+
+# Content-addressed blob store. Bytes live in `data/<sha256[:2]>/<sha256>` so identical images
+# from different urls are stored once, `meta/<sha256(url)>.json` maps a url to its blob and etag.
+class BlobStore:
+    def __init__(self, path=BLOB_DIR):
+        self.path = path
+
+    def _meta_file(self, url):
+        return os.path.join(self.path, "meta", f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json")
+
+    def _blob_file(self, digest):
+        return os.path.join(self.path, "data", digest[:2], digest)
+
+    def meta(self, url):
+        try:
+            with open(self._meta_file(url), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def read(self, meta):
+        try:
+            with open(self._blob_file(meta["sha256"]), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def get(self, url):
+        if (meta := self.meta(url)) and (data := self.read(meta)) is not None:
+            return data, meta["content_type"]
+        return None
+
+    def put(self, url, data, content_type, etag=None):
+        digest = hashlib.sha256(data).hexdigest()
+        blob = self._blob_file(digest)
+        if not os.path.exists(blob):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            tmp = f"{blob}.{os.getpid()}.{id(data)}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, blob)
+
+        meta = {"url": url, "sha256": digest, "content_type": content_type, "etag": etag}
+        file = self._meta_file(url)
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        with open(file, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        return digest
+
+
+blob_store = BlobStore()
+
+
+def fetch(url, revalidate=False, store=blob_store):
+    # returns (bytes, content type), hitting the network only for new urls or etag revalidation
+    meta = store.meta(url)
+    if meta and not revalidate and (data := store.read(meta)) is not None:
+        return data, meta["content_type"]
+
+    headers = {"If-None-Match": meta["etag"]} if meta and meta.get("etag") else {}
+    response = session.get(url, headers=headers, timeout=TIMEOUT)
+    if response.status_code == 304 and (cached := store.get(url)):
+        return cached
+    response.raise_for_status()
+
+    content_type = response.headers.get("content-type", "application/octet-stream")
+    store.put(url, response.content, content_type, response.headers.get("etag"))
+    return response.content, content_type
+
+
+@traced()
+def fetch_many(urls, max_workers=8, revalidate=False):
+    # parallel downloads, failed urls are left out of the result
+    urls = list(dict.fromkeys(urls))
+    results = {}
+
+    def worker(url):
+        try:
+            results[url] = fetch(url, revalidate=revalidate)
+        except Exception as e:
+            print(f"Error fetching {url}: {e}")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for future in [submit(executor, worker, url) for url in urls]:
+            future.result()
+    return {url: results[url] for url in urls if url in results}
+
+
+def fetch_app_images(details, max_workers=8):
+    # warm the blob store with an app's icon, header image and screenshots
+    urls = [details.get("icon"), details.get("headerImage"), *details["media"]["screenshots"]]
+    return fetch_many([url for url in urls if url], max_workers=max_workers)
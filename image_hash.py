@@ -0,0 +1,156 @@
+import argparse
+import io
+import json
+import os
+import threading
+
+import numpy as np
+
+from cache import CACHE_DIR
+from fetch import fetch_many
+from records import read_records
+
+INDEX_FILE = os.path.join(CACHE_DIR, "screenshot_index.jsonl")
+# dHash grid, HASH_SIZE x HASH_SIZE gradient bits = a 64 bit hash
+HASH_SIZE = 8
+# hamming distance up to which two screenshots count as the same image (recompressed, resized, small edits)
+DUPLICATE_DISTANCE = 6
+# flat or mostly blank images (splash, login screens) hash to almost all 0 bits and would match across unrelated
+# apps, hashes with fewer than MIN_BITS bits set (or unset) are kept in the index but never matched
+MIN_BITS = 8
+
+
+def image_hash(data, size=HASH_SIZE):
+    # dHash: grayscale, shrink to (size + 1) x size and keep whether each pixel is brighter than its left neighbour.
+    # Stable under rescaling and recompression, which is how cloned listings re-upload the same screenshots.
+    # Returns a hex string, None when the bytes are not a readable image
+    try:
+        from PIL import Image
+
+        with Image.open(io.BytesIO(data)) as image:
+            pixels = np.asarray(image.convert("L").resize((size + 1, size), Image.Resampling.LANCZOS), dtype=np.int16)
+    except Exception as e:
+        print(f"Error hashing image: {e}")
+        return None
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return np.packbits(bits).tobytes().hex()
+
+
+def informative(hash):
+    return MIN_BITS <= int(hash, 16).bit_count() <= HASH_SIZE * HASH_SIZE - MIN_BITS
+
+
+# Append-only jsonl index of screenshot hashes, one {"hash", "appId", "url", "description"} line per
+# screenshot seen. Near-duplicate lookups compare a hash against every entry at once with numpy.
+class ScreenshotIndex:
+    def __init__(self, path=INDEX_FILE):
+        self.path = path
+        self.entries = []
+        self.seen = set()
+        self._hashes = None
+        self._matchable = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r+b") as f:
+            offset = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # a line cut short by a crash, dropped so the next entry is appended on a line of its own
+                    f.truncate(offset)
+                    break
+                offset += len(line)
+                try:
+                    self._add(json.loads(line))
+                except (json.JSONDecodeError, KeyError):
+                    pass
+
+    def _add(self, entry):
+        key = (entry["appId"], entry["url"])
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+        self.entries.append(entry)
+        self._hashes = None
+        return True
+
+    def add(self, hash, app_id, url, description=None):
+        entry = {"hash": hash, "appId": app_id, "url": url, "description": description}
+        with self._lock:
+            if not self._add(entry):
+                return
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _arrays(self):
+        with self._lock:
+            if self._hashes is None:
+                self._hashes = np.array([int(entry["hash"], 16) for entry in self.entries], dtype=np.uint64)
+                self._matchable = np.array([informative(entry["hash"]) for entry in self.entries], dtype=bool)
+            return self._hashes, self._matchable
+
+    def distances(self, hash):
+        # hamming distance to every entry, uninformative entries are pushed out of any match range
+        hashes, matchable = self._arrays()
+        distances = np.bitwise_count(hashes ^ np.uint64(int(hash, 16))).astype(np.int64)
+        return np.where(matchable, distances, HASH_SIZE * HASH_SIZE + 1)
+
+    def nearest(self, hash, max_distance=DUPLICATE_DISTANCE):
+        # closest described entry within max_distance, or None
+        if not self.entries or not informative(hash):
+            return None
+        distances = self.distances(hash)
+        for i in np.argsort(distances, kind="stable"):
+            if distances[i] > max_distance:
+                return None
+            if self.entries[i].get("description"):
+                return self.entries[i]
+        return None
+
+    def shared_with(self, app_id, max_distance=DUPLICATE_DISTANCE):
+        # other apps with at least one screenshot near-identical to one of `app_id`'s
+        own = [entry["hash"] for entry in self.entries if entry["appId"] == app_id and informative(entry["hash"])]
+        apps = set()
+        for hash in own:
+            matches = np.nonzero(self.distances(hash) <= max_distance)[0]
+            apps.update(self.entries[i]["appId"] for i in matches)
+        apps.discard(app_id)
+        return sorted(apps)
+
+
+screenshot_index = ScreenshotIndex()
+
+
+def index_records(records, index=screenshot_index):
+    # hashes the described screenshots of expanded records into the index, so their descriptions are reused
+    count = 0
+    for record in records:
+        screenshots = record.get("media", {}).get("screenshots") or {}
+        if not isinstance(screenshots, dict):
+            continue
+        images = fetch_many(list(screenshots))
+        for url, (data, _) in images.items():
+            if hash := image_hash(data):
+                index.add(hash, record["appId"], url, screenshots[url])
+                count += 1
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index the screenshots of expanded datasets and list apps sharing them")
+    parser.add_argument("paths", nargs="+")
+    args = parser.parse_args()
+
+    app_ids = []
+    for path in args.paths:
+        records = list(read_records(path))
+        print(f"{path}: {index_records(records)} screenshots indexed")
+        app_ids += [record["appId"] for record in records]
+    for app_id in dict.fromkeys(app_ids):
+        if shared := screenshot_index.shared_with(app_id):
+            print(f"{app_id} shares screenshots with {', '.join(shared)}")
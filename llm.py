@@ -1,16 +1,43 @@
 import enum
+import hashlib
 import json
 import os
-import time
+from concurrent.futures import ThreadPoolExecutor
 
 import openai
-import requests
-from google import genai
 from google.genai import types
 
-from utils import truncate_text
-
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+from backends import get_llm
+from cache import CACHE_DIR, DiskCache, make_key
+from developers import developer_registry
+from fetch import fetch, fetch_many
+from image_hash import image_hash, screenshot_index
+from permission_index import score_permissions
+from prescreen import prescreen as prescreen_app
+from ratelimit import call, estimate_tokens
+from review_features import review_features
+from tracing import span, submit, traced
+from utils import build_prompt, digest, minify, permission_lines, render_compact, render_section
+
+# PROMPT_STYLE=verbose sends the indented json payloads and full descriptions of the original prompts
+COMPACT_PROMPTS = os.getenv("PROMPT_STYLE", "compact") != "verbose"
+
+# GEMINI_CACHE=off bypasses the response cache, GEMINI_CACHE=refresh re-queries and overwrites it
+response_cache = DiskCache(
+    os.path.join(CACHE_DIR, "gemini"),
+    enabled=os.getenv("GEMINI_CACHE", "on") != "off",
+    refresh=os.getenv("GEMINI_CACHE", "on") == "refresh",
+)
+
+
+def generate(model, contents, config=None, tokens=0):
+    # every gemini request goes through the shared per-model limiter and retry scheduler
+    with span("gemini", model=model) as record:
+        response = call(model, get_llm().models.generate_content, model=model, contents=contents, config=config, tokens=tokens)
+        if usage := getattr(response, "usage_metadata", None):
+            record["promptTokens"] = usage.prompt_token_count or 0
+            record["outputTokens"] = usage.candidates_token_count or 0
+        return response
 
 
 class App(enum.Enum):
@@ -28,10 +55,10 @@ def load_json(response):
     return response
 
 
-def get_base(details):
+def get_base(details, description=None):
     title = details["title"]
     summary = details["summary"]
-    description = details["description"]
+    description = details["description"] if description is None else description
     prompt = f"""
     Provide a single structured JSON output in this format:
     {{ "type": "fraud"|"genuine"|"suspected", "reason": "Concise explanation (300 char max)" }}
@@ -44,62 +71,194 @@ def get_base(details):
     return prompt
 
 
+# model="gemini-2.0-flash-001"
+IMAGE_MODEL = "gemini-2.0-flash-lite"
+IMAGE_QUESTION = "What is this image?"
+# gemini bills a single image as 258 tokens
+IMAGE_TOKENS = 258
+# images packed into one batched describe call, small enough that the descriptions fit in BATCH_OUTPUT_TOKENS
+MAX_BATCH_IMAGES = 8
+BATCH_OUTPUT_TOKENS = 8192
+
+
+def image_key(data):
+    return make_key(IMAGE_MODEL, IMAGE_QUESTION, hashlib.sha256(data).hexdigest())
+
+
+@traced()
 def extract_image(url):
-    image = requests.get(url)
-    mime = image.headers["content-type"]
+    data, mime = fetch(url)
+    return describe_image(data, mime)
+
+
+def describe_image(data, mime):
+    key = image_key(data)
+    if (text := response_cache.get(key)) is not None:
+        return text
 
-    response = client.models.generate_content(
-        # model="gemini-2.0-flash-001",
-        model="gemini-2.0-flash-lite",
-        contents=["What is this image?", types.Part.from_bytes(data=image.content, mime_type=mime)],
+    response = generate(
+        IMAGE_MODEL,
+        [IMAGE_QUESTION, types.Part.from_bytes(data=data, mime_type=mime)],
+        tokens=IMAGE_TOKENS + estimate_tokens(IMAGE_QUESTION),
     )
+    response_cache.set(key, response.text)
     return response.text
 
 
-def describe_screenshots(details, num=5):
-    urls = list(details["media"]["screenshots"])
-    ssdict = {}
-    # to respect rate limits, only process 5 images for each app
-    for url in urls[:num]:
-        time.sleep(1)
+@traced()
+def describe_images(urls, app_ids=None):
+    # describe many images with one gemini call per MAX_BATCH_IMAGES, returns {url: description}.
+    # Images near-identical to one described before (same screenshot re-uploaded by a clone or kept across
+    # versions) reuse its description. `app_ids` maps urls to their app for the screenshot index
+    images = fetch_many(urls)
+    app_ids = app_ids or {}
+
+    descriptions = {}
+    hashes = {}
+    guessed = set()
+    pending = []
+    for url, (data, _) in images.items():
+        hashes[url] = image_hash(data)
+        if (text := response_cache.get(image_key(data))) is not None:
+            descriptions[url] = text
+        elif hashes[url] and (match := screenshot_index.nearest(hashes[url])):
+            # not cached under this image's key, the match is a guess and the exact image may be described later
+            with span("screenshot_hit"):
+                descriptions[url] = match["description"]
+                guessed.add(url)
+        else:
+            pending.append(url)
+
+    prompt = (
+        "Describe each of the following images, answering 'What is this image?' for every one of them. "
+        + "Return one entry per image with its index and description."
+    )
+    config = {
+        "max_output_tokens": BATCH_OUTPUT_TOKENS,
+        "response_mime_type": "application/json",
+        "response_schema": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {"index": {"type": "INTEGER"}, "description": {"type": "STRING"}},
+                "required": ["index", "description"],
+            },
+        },
+    }
+    for start in range(0, len(pending), MAX_BATCH_IMAGES):
+        chunk = pending[start : start + MAX_BATCH_IMAGES]
+        contents = [prompt]
+        for index, url in enumerate(chunk):
+            data, mime = images[url]
+            contents += [f"Image {index}:", types.Part.from_bytes(data=data, mime_type=mime)]
+
         try:
-            text = extract_image(url)
-            print(text)
-            ssdict[url] = text
+            response = generate(
+                IMAGE_MODEL,
+                contents,
+                config=config,
+                tokens=IMAGE_TOKENS * len(chunk) + estimate_tokens(prompt),
+            )
+            items = json.loads(response.text)
+            if not isinstance(items, list):
+                raise ValueError(f"expected a list of descriptions, got {type(items).__name__}")
+            for item in items:
+                index = item.get("index") if isinstance(item, dict) else None
+                if isinstance(index, int) and 0 <= index < len(chunk) and isinstance(item.get("description"), str):
+                    url = chunk[index]
+                    descriptions[url] = item["description"]
+                    response_cache.set(image_key(images[url][0]), item["description"])
         except Exception as e:
-            print(f"Error extracting image: {e}")
+            print(f"Error describing images: {e}")
+
+        # a failed or cut short batch falls back to one call per image it did not describe
+        for url in chunk:
+            if url in descriptions:
+                continue
+            try:
+                descriptions[url] = describe_image(*images[url])
+            except Exception as e:
+                print(f"Error describing image {url}: {e}")
+
+    # borrowed descriptions are indexed without one, they count for sharedScreenshots but nearest() only
+    # hands out text gemini wrote for that image, so a guess never sticks or chains to further images
+    for url, description in descriptions.items():
+        if hashes[url] and url in app_ids:
+            screenshot_index.add(hashes[url], app_ids[url], url, None if url in guessed else description)
+    return descriptions
+
+
+def describe_screenshots(details, num=None, batch=True):
+    urls = list(details["media"]["screenshots"])
+    selected = urls[:num]
+    if batch:
+        descriptions = describe_images(selected, {url: details["appId"] for url in selected})
+        ssdict = {url: descriptions[url] for url in selected if url in descriptions}
+    else:
+        ssdict = {}
+        # rate limits are handled by the shared limiter in `generate`
+        for url in selected:
+            try:
+                text = extract_image(url)
+                print(text)
+                ssdict[url] = text
+            except Exception as e:
+                print(f"Error extracting image: {e}")
 
     details["media"]["screenshots"] = ssdict
-    details["media"]["other_screenshots"] = urls[num:]
+    details["media"]["other_screenshots"] = urls[len(selected) :]
+    details["sharedScreenshots"] = screenshot_index.shared_with(details["appId"])
     return details
 
 
-def analyze_fraud(prompt):
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=[
-                {
-                    "role": "user",
-                    "parts": [
-                        {
-                            "text": "You are an AI expert in fraud detection for mobile apps. "
-                            + "Respond with valid JSON only in this format: "
-                            + '{"type": "fraud"|"genuine"|"suspected", "reason": "Concise explanation (300 char max)"}\n\n'
-                            + prompt
-                        }
-                    ],
-                }
-            ],
-            config={
-                "temperature": 0.5,
-                "response_mime_type": "application/json",
-            },
-        )
+def describe_apps_screenshots(apps, num=None):
+    # pack several apps' screenshots into the same batched calls
+    selected = {id(details): list(details["media"]["screenshots"])[:num] for details in apps}
+    app_ids = {url: details["appId"] for details in apps for url in selected[id(details)]}
+    descriptions = describe_images(list(app_ids), app_ids)
+    for details in apps:
+        urls = list(details["media"]["screenshots"])
+        chosen = selected[id(details)]
+        details["media"]["screenshots"] = {url: descriptions[url] for url in chosen if url in descriptions}
+        details["media"]["other_screenshots"] = urls[len(chosen) :]
+    for details in apps:
+        details["sharedScreenshots"] = screenshot_index.shared_with(details["appId"])
+    return apps
+
+
+SYSTEM_PROMPT = (
+    "You are an AI expert in fraud detection for mobile apps. "
+    + "Respond with valid JSON only in this format: "
+    + '{"type": "fraud"|"genuine"|"suspected", "reason": "Concise explanation (300 char max)"}\n\n'
+)
+
+
+def generate_json(text, model, config):
+    # one cached json request, raises when gemini fails or does not return valid json
+    key = make_key(model, config, text)
+    if (cached := response_cache.get(key)) is not None:
+        with span("cache_hit", model=model):
+            return cached
+
+    response = generate(
+        model,
+        [{"role": "user", "parts": [{"text": text}]}],
+        config=config,
+        tokens=estimate_tokens(text),
+    )
+    result = json.loads(response.text)
+    response_cache.set(key, result)
+    return result
 
-        response_text = response.text
-        return json.loads(response_text)
 
+@traced()
+def analyze_fraud(prompt, model="gemini-2.0-flash"):
+    config = {
+        "temperature": 0.5,
+        "response_mime_type": "application/json",
+    }
+    try:
+        return generate_json(SYSTEM_PROMPT + prompt, model, config)
     except Exception as e:
         print(f"Error in analyze_fraud: {e}")
         return None
@@ -118,69 +277,158 @@ def analyze_fraud(prompt):
 #     return response
 
 
-def analyze_developer(app_data):
+def dump(value, compact=COMPACT_PROMPTS):
+    return render_compact(value) if compact else json.dumps(value, indent=2)
+
+
+def developer_prompt(app_data, compact=COMPACT_PROMPTS):
     dev_details = app_data["developer"]
 
-    prompt = f"""
+    def make(description, website):
+        return f"""
     Analyze the following app developer information for potential fraud and provide your reasoning.
     Guidelines -
     1. You are given the developer's website content and the app description.
     2. Check if the developer's website contains any suspicious or fraudulent elements.
 
-    {get_base(app_data)}
+    {get_base(app_data, description)}
     Developer Information:
-    {json.dumps(dev_details, indent=2)}
+    {dump(dev_details, compact)}
     
-    Website Content: {app_data.get("websiteContent", "N/A")}
+    Website Content: {website}
     """
-    prompt = truncate_text(prompt)
-    return analyze_fraud(prompt)
 
+    # long website content and descriptions are cut proportionally instead of chopping the tail of the prompt
+    description = digest(app_data["description"]) if compact else app_data["description"]
+    sections = {"description": description, "website": app_data.get("websiteContent", "N/A")}
+    return build_prompt(make, sections, render=render_compact if compact else render_section)
 
-def analyze_images(app_data):
+
+@traced()
+def analyze_developer(app_data):
+    return analyze_fraud(developer_prompt(app_data))
+
+
+@traced()
+def analyze_developer_profile(developer, website="N/A"):
+    # developer-only variant of analyze_developer, no app details so the verdict holds for all of the developer's apps
+    def make(website):
+        return f"""
+    Analyze the following app developer for potential fraud and provide your reasoning.
+    Guidelines -
+    1. You are given the developer's details and website content, the verdict is shared by all of the developer's apps.
+    2. Check if the developer's website contains any suspicious or fraudulent elements.
+    3. Check if the developer name, email domain, website and address are consistent with each other.
+
+    Developer Information:
+    {dump(developer)}
+
+    Website Content: {website}
+    """
+
+    return analyze_fraud(build_prompt(make, {"website": website}))
+
+
+def analyze_shared_developer(app_data):
+    # one developer analysis per developer and ttl, see developers.DeveloperRegistry.
+    # The prompt holds every developer field and the website content, a change to any of them is analyzed again
+    website = app_data.get("websiteContent", "N/A")
+    developer = app_data["developer"]
+    return developer_registry.get(
+        "analysis",
+        developer,
+        lambda developer: analyze_developer_profile(developer, website),
+        fields=tuple(sorted(developer)),
+        extra=(website,),
+    )
+
+
+def shared_screenshots_note(app_data):
+    if shared := app_data.get("sharedScreenshots"):
+        return f"Near-identical screenshots are also used by these apps (common with clones): {', '.join(shared)}"
+    return ""
+
+
+def images_prompt(app_data, compact=COMPACT_PROMPTS):
     content = list(app_data["media"]["screenshots"].values())
-    prompt = f"""
+    description = digest(app_data["description"]) if compact else None
+    return f"""
     Analyze the following app screenshots descriptions for potential fraud and provide your reasoning.
     Guidelines -
     1. Identify any discrepancies or suspicious elements that may indicate fraudulent activity.
     2. Check if the screenshots match the app's description and functionality.
     3. Check if the screenshots are fake, spam, misleading, or irrelevant. (Check if the image descriptions are related to the app description)
 
-    {get_base(app_data)}
+    {get_base(app_data, description)}
     App Screenshot Descriptions:
-    {json.dumps(content, indent=2)}
+    {dump(content, compact)}
+    {shared_screenshots_note(app_data)}
     """
 
-    return analyze_fraud(prompt)
+
+@traced()
+def analyze_images(app_data):
+    return analyze_fraud(images_prompt(app_data))
 
 
-def analyze_reviews(app_data):
+# raw reviews sent next to the computed signals, for context only
+REVIEW_SAMPLE = 15
+
+
+def review_sample(app_data, compact=COMPACT_PROMPTS):
     content = app_data["reviews"]
-    prompt = f"""
-    Analyze the following app reviews for potential fraud and provide your reasoning.
+    if compact:
+        # repeated reviews are already counted in the signals, the sample shows each one once
+        content = list({(review.get("userName"), review.get("content")): review for review in content}.values())
+    return sorted(content, key=lambda review: review.get("thumbsUpCount") or 0, reverse=True)[:REVIEW_SAMPLE]
+
+
+def reviews_prompt(app_data, compact=COMPACT_PROMPTS):
+    signals = review_features(app_data["reviews"])
+    sample = review_sample(app_data, compact)
+
+    def make(description, reviews):
+        return f"""
+    Analyze the following app review signals for potential fraud and provide your reasoning.
     Guidelines -
-    1. Identify any discrepancies or suspicious elements that may indicate fraudulent activity.
+    1. The signals are computed over all {signals["count"]} collected reviews: near-duplicate clusters, repeated phrases and emojis,
+       username pattern entropy, score vs sentiment mismatch and thumbs-up skew. High duplicate or repetition rates,
+       low username entropy and many mismatches suggest fake or bot reviews.
     2. Check if the reviews match the app's description and functionality.
     3. Check if reviews are fake, spam, misleading, or irrelevant.
-    4. Check if the reviews are from verified users or bots.
-    5. Check if the reviews contain repeated phrases or words or emojis.
+    4. Check if users report scams, money loss, or behaviour that differs from the description.
 
-    {get_base(app_data)}
-    Reviews:
-    {json.dumps(content, indent=2)}
+    {get_base(app_data, description)}
+    Review Signals:
+    {minify(signals) if compact else json.dumps(signals)}
+
+    Most upvoted reviews:
+    {reviews}
     """
-    prompt = truncate_text(prompt)
-    return analyze_fraud(prompt)
 
+    # reviews are dropped whole when over budget, never cut mid-record
+    description = digest(app_data["description"]) if compact else app_data["description"]
+    return build_prompt(
+        make, {"description": description, "reviews": sample}, render=render_compact if compact else render_section
+    )
 
-def analyze_basic(app_data):
-    # app_data.pop("media")
-    app_data.pop("extra")
-    app_data.pop("reviews")
-    # app_data.pop("permissions")
-    app_data.pop("emailValid", None)
-    app_data.pop("websiteContent")
-    prompt = f"""
+
+@traced()
+def analyze_reviews(app_data):
+    return analyze_fraud(reviews_prompt(app_data))
+
+
+# fields covered by the other aspects, left out of the description analysis
+BASIC_EXCLUDE = ("extra", "reviews", "emailValid", "websiteContent", "discoveredIn", "sharedScreenshots")
+# already in get_base, the compact prompt does not repeat them in the app details
+BASE_FIELDS = ("title", "summary", "description")
+
+
+def basic_prompt(app_data, compact=COMPACT_PROMPTS):
+    # build a filtered copy instead of popping, app_data is shared with the other aspects
+    exclude = BASIC_EXCLUDE + BASE_FIELDS if compact else BASIC_EXCLUDE
+    details = {k: v for k, v in app_data.items() if k not in exclude}
+    return f"""
     Analyze the following app description and basic details for potential fraud and provide your reasoning.
     Guidelines -
     1. Identify any discrepancies or suspicious elements that may indicate fraudulent activity.
@@ -191,32 +439,61 @@ def analyze_basic(app_data):
     {get_base(app_data)}
 
     App Description:
-    {json.dumps(app_data, indent=2)}
+    {dump(details, compact)}
 
     """
-    return analyze_fraud(prompt)
 
 
-def analyze_permissions(app_data):
+@traced()
+def analyze_basic(app_data):
+    # the only aspect that gets the full description in the compact prompts
+    return analyze_fraud(basic_prompt(app_data))
+
+
+def permissions_prompt(app_data, index, compact=COMPACT_PROMPTS):
     content = app_data["permissions"]
-    prompt = f"""
+    description = digest(app_data["description"]) if compact else None
+    return f"""
     Analyze the following app permissions for potential fraud and provide your reasoning accordingly.
     Guidelines -
     1. Identify any discrepancies or suspicious elements that may indicate fraudulent activity.
     2. Check if the permissions are necessary for the app's functionality.
     3. Check if the permissions are excessive or intrusive.
     4. Check if the permissions are related to sensitive data or device features.
+    5. The permission risk index compares the app with the apps of its category. "unusual" permissions are rarely
+       requested by genuine apps in the same category, "coverage" is the share of the category's common permissions the
+       app requests, "risk" is the summed sensitivity weight of the requested permissions.
 
-    {get_base(app_data)}
+    {get_base(app_data, description)}
     Permissions:
-    {json.dumps(content, indent=2)}
+    {permission_lines(content) if compact else json.dumps(content, indent=2)}
+
+    Permission Risk Index:
+    {json.dumps({k: index[k] for k in ("risk", "sensitive", "unusual", "coverage")})}
     """
-    return analyze_fraud(prompt)
 
 
-def analyze_overall(results, app_data):
+def typical_permissions(app_data, index):
+    return {
+        "type": "genuine",
+        "reason": f"Permission set is typical for the {app_data.get('category', 'app')} category "
+        + f"({round(index['coverage'] * 100)}% of its common permissions, no unusual sensitive permissions).",
+    }
+
+
+@traced()
+def analyze_permissions(app_data):
+    # the local index settles permission sets typical for the category, gemini sees everything else
+    index = score_permissions(app_data["permissions"], app_data.get("categoryId"))
+    if index["typical"]:
+        return typical_permissions(app_data, index)
+    return analyze_fraud(permissions_prompt(app_data, index))
+
+
+def overall_prompt(results, app_data, compact=COMPACT_PROMPTS):
+    description = digest(app_data["description"]) if compact else None
     # Your priorities are - Developer Analysis > Image Analysis > Review Analysis > Description Analysis > Permissions Analysis.
-    prompt = f"""
+    return f"""
     Analyze the following fraud detection results for the app and provide your reasoning accordingly.
     
     Instructions:
@@ -226,23 +503,179 @@ def analyze_overall(results, app_data):
     4. Provide a thoughtful final assessment of the app's potential fraud status.
     5. If the app is suspected of fraud, critically re-evaluate the evidence and try to resolve the suspicion—either confirm it as fraudulent or clear it as genuine.
     6. Consider the app's details (such as metadata, description, and behavior) in your reasoning.
-    {get_base(app_data)}
+    {get_base(app_data, description)}
     Results:
-    {json.dumps(results, indent=2)}
+    {minify(results) if compact else json.dumps(results, indent=2)}
 
     """
-    return analyze_fraud(prompt)
 
 
-def analyze(app_data, filename=None, print=False):
-    results = {
-        "image_analysis": analyze_images(app_data),
-        "review_analysis": analyze_reviews(app_data),
-        "developer_analysis": analyze_developer(app_data),
-        "description_analysis": analyze_basic(app_data),
-        "permissions_analysis": analyze_permissions(app_data),
+@traced()
+def analyze_overall(results, app_data):
+    return analyze_fraud(overall_prompt(results, app_data))
+
+
+ASPECTS = {
+    "image_analysis": analyze_images,
+    "review_analysis": analyze_reviews,
+    "developer_analysis": analyze_developer,
+    "description_analysis": analyze_basic,
+    "permissions_analysis": analyze_permissions,
+}
+
+# prompt builders of the aspects, prompt(app_data, compact) -> text, used to compare prompt sizes
+PROMPTS = {
+    "image_analysis": images_prompt,
+    "review_analysis": reviews_prompt,
+    "developer_analysis": developer_prompt,
+    "description_analysis": basic_prompt,
+    "permissions_analysis": lambda app_data, compact=COMPACT_PROMPTS: permissions_prompt(
+        app_data, score_permissions(app_data["permissions"], app_data.get("categoryId")), compact
+    ),
+}
+
+
+MODES = ("multi", "combined")
+
+VERDICT_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "type": {"type": "STRING", "enum": [app.value for app in App]},
+        "reason": {"type": "STRING"},
+    },
+    "required": ["type", "reason"],
+}
+COMBINED_KEYS = [*ASPECTS, "overall_analysis"]
+# the overall verdict is generated last, after the aspect verdicts it summarizes
+COMBINED_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {name: VERDICT_SCHEMA for name in COMBINED_KEYS},
+    "required": COMBINED_KEYS,
+    "propertyOrdering": COMBINED_KEYS,
+}
+# the verdict format is part of the prompt and enforced by COMBINED_SCHEMA
+COMBINED_SYSTEM_PROMPT = "You are an AI expert in fraud detection for mobile apps. Respond with valid JSON only.\n\n"
+# the combined prompt carries every section, so it gets a bigger budget than a single aspect
+COMBINED_MAX_TOKENS = 16000
+# details with a section of their own in the combined prompt
+COMBINED_EXCLUDE = BASIC_EXCLUDE + BASE_FIELDS + ("developer", "media", "permissions")
+
+
+def combined_prompt(app_data, index, compact=COMPACT_PROMPTS):
+    signals = review_features(app_data["reviews"])
+    details = {k: v for k, v in app_data.items() if k not in COMBINED_EXCLUDE}
+    screenshots = list(app_data["media"]["screenshots"].values())
+    permissions = app_data["permissions"]
+
+    def make(description, website, reviews):
+        return f"""
+    Analyze the following app for potential fraud. Give a verdict for every aspect based on its own sections,
+    then an overall verdict.
+    Aspects -
+    1. image_analysis: check if the screenshot descriptions match the app's description and functionality,
+       and if the screenshots are fake, spam, misleading, or irrelevant.
+    2. review_analysis: the signals are computed over all {signals["count"]} collected reviews: near-duplicate clusters,
+       repeated phrases and emojis, username pattern entropy, score vs sentiment mismatch and thumbs-up skew. High duplicate
+       or repetition rates, low username entropy and many mismatches suggest fake or bot reviews. Check if users report
+       scams, money loss, or behaviour that differs from the description.
+    3. developer_analysis: check if the developer's website contains any suspicious or fraudulent elements and if the
+       developer details are consistent with each other.
+    4. description_analysis: check if the description matches the app's title, summary, functionality, screenshots
+       and permissions, and if it is misleading or irrelevant.
+    5. permissions_analysis: check if the permissions are necessary for the app's functionality, excessive or intrusive.
+       "unusual" permissions are rarely requested by genuine apps in the same category, "coverage" is the share of the
+       category's common permissions the app requests, "risk" is the summed sensitivity weight of the requested permissions.
+    6. overall_analysis: give equal weight to each aspect verdict and provide a final assessment. If the app is suspected
+       of fraud, critically re-evaluate the evidence and try to resolve the suspicion—either confirm it as fraudulent
+       or clear it as genuine.
+    Every verdict is {{ "type": "fraud"|"genuine"|"suspected", "reason": "Concise explanation (300 char max)" }}
+
+    App details:
+    Title: {app_data["title"]}
+    Summary: {app_data["summary"]}
+    Description: {description}
+
+    Other Details:
+    {dump(details, compact)}
+
+    Developer Information:
+    {dump(app_data["developer"], compact)}
+
+    Website Content: {website}
+
+    App Screenshot Descriptions:
+    {dump(screenshots, compact)}
+    {shared_screenshots_note(app_data)}
+
+    Review Signals:
+    {minify(signals) if compact else json.dumps(signals)}
+
+    Most upvoted reviews:
+    {reviews}
+
+    Permissions:
+    {permission_lines(permissions) if compact else json.dumps(permissions, indent=2)}
+
+    Permission Risk Index:
+    {json.dumps({k: index[k] for k in ("risk", "sensitive", "unusual", "coverage")})}
+    """
+
+    sections = {
+        "description": app_data["description"],
+        "website": app_data.get("websiteContent", "N/A"),
+        "reviews": review_sample(app_data, compact),
     }
-    results["overall_analysis"] = analyze_overall(results, app_data)
+    render = render_compact if compact else render_section
+    return build_prompt(make, sections, max_tokens=COMBINED_MAX_TOKENS, render=render)
+
+
+@traced()
+def analyze_combined(app_data, model="gemini-2.0-flash"):
+    # every aspect and the overall verdict from one schema-enforced call, in the shape analyze returns.
+    # one request instead of six, the description and metadata are read once
+    index = score_permissions(app_data["permissions"], app_data.get("categoryId"))
+    config = {
+        "temperature": 0.5,
+        "response_mime_type": "application/json",
+        "response_schema": COMBINED_SCHEMA,
+    }
+    text = COMBINED_SYSTEM_PROMPT + combined_prompt(app_data, index)
+    try:
+        result = generate_json(text, model, config)
+    except Exception as e:
+        print(f"Error in analyze_combined: {e}")
+        result = {}
+
+    # the model's own permissions verdict is kept, the overall verdict was reasoned from it
+    return {name: result.get(name) if isinstance(result, dict) else None for name in COMBINED_KEYS}
+
+
+def analyze_aspects(app_data, max_workers=5, aspects=None, per_developer=False):
+    # each aspect is an independent gemini round-trip, so fan them out and join before the overall call.
+    # `aspects` limits the run to some of the ASPECTS names, e.g. the ones whose inputs changed,
+    # `per_developer` shares one developer analysis between all apps of a developer
+    fns = ASPECTS | ({"developer_analysis": analyze_shared_developer} if per_developer else {})
+    selected = {name: fn for name, fn in fns.items() if aspects is None or name in aspects}
+    if max_workers <= 1:
+        return {name: fn(app_data) for name, fn in selected.items()}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {name: submit(executor, fn, app_data) for name, fn in selected.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def analyze(app_data, filename=None, print=False, max_workers=5, prescreen=False, per_developer=False, mode="multi"):
+    # with prescreen, clear-cut apps get a local heuristic verdict and skip every gemini call.
+    # mode="combined" asks for every aspect and the overall verdict in a single call, see analyze_combined
+    if mode not in MODES:
+        raise ValueError(f"unknown analysis mode {mode!r}, expected one of {MODES}")
+    if prescreen and (verdict := prescreen_app(app_data)):
+        results = {"prescreen": verdict, "overall_analysis": {"type": verdict["type"], "reason": verdict["reason"]}}
+    elif mode == "combined":
+        results = analyze_combined(app_data)
+    else:
+        results = analyze_aspects(app_data, max_workers=max_workers, per_developer=per_developer)
+        results["overall_analysis"] = analyze_overall(results, app_data)
     if filename:
         with open(filename, "w", encoding="utf-8") as file:
             json.dump(results, file, indent=2, ensure_ascii=False)
@@ -0,0 +1,154 @@
+import argparse
+import functools
+import glob
+import json
+import os
+from collections import Counter, defaultdict
+
+from cache import CACHE_DIR
+from records import read_records
+
+INDEX_FILE = os.path.join(CACHE_DIR, "permission_baseline.json")
+# crawled category datasets are the reference for what is normal in a category
+BASELINE_DATASETS = ["dataset/dataset_*.jsonl", "dataset/crawl.jsonl"]
+# the labeled sets evaluate.py scores, their apps never enter the baseline
+EVALUATION_DATASETS = ["dataset/fraud-expanded.json", "dataset/genuine-expanded.json"]
+
+# risk weight of sensitive permissions as google play words them, anything missing weighs 0
+PERMISSION_WEIGHTS = {
+    "read your text messages (SMS or MMS)": 5,
+    "receive text messages (SMS)": 5,
+    "send SMS messages": 5,
+    "read call log": 5,
+    "bind to a notification listener service": 4,
+    "draw over other apps": 4,
+    "directly call phone numbers": 4,
+    "read your contacts": 4,
+    "modify your contacts": 3,
+    "find accounts on the device": 3,
+    "add or remove accounts": 3,
+    "create accounts and set passwords": 3,
+    "use accounts on the device": 2,
+    "read phone status and identity": 2,
+    "precise location (GPS and network-based)": 3,
+    "approximate location (network-based)": 1,
+    "record audio": 3,
+    "capture audio output": 3,
+    "capture secure video output": 4,
+    "take pictures and videos": 2,
+    "read calendar events plus confidential information": 3,
+    "add or modify calendar events and send email to guests without owners' knowledge": 3,
+    "retrieve running apps": 3,
+    "close other apps": 3,
+    "reorder running apps": 1,
+    "modify system settings": 3,
+    "modify secure system settings": 5,
+    "full license to interact across users": 5,
+    "send package removed broadcast": 4,
+    "download files without notification": 3,
+    "Access all system downloads": 3,
+    "install shortcuts": 1,
+    "read the contents of your USB storage": 1,
+    "modify or delete the contents of your USB storage": 1,
+}
+
+# A permission set is typical when it holds at least TYPICAL_COVERAGE of the permissions COMMON_FREQUENCY of
+# the category's reference apps request, and none that fewer than UNUSUAL_FREQUENCY of them do.
+# Genuine finance apps request most of their category's usual set (sms, contacts, location, camera),
+# cloned and scam apps mostly ship with little more than network access, so a high sensitive risk
+# score alone says nothing about fraud and is only passed on to the prompt
+COMMON_FREQUENCY = 0.5
+TYPICAL_COVERAGE = 0.6
+UNUSUAL_FREQUENCY = 0.1
+MIN_CATEGORY_APPS = 5
+
+
+def permission_set(permissions):
+    # the same permission is often listed under two groups (Phone / Device ID & call information)
+    return {p for perms in (permissions or {}).values() for p in perms}
+
+
+def baseline_paths(patterns=BASELINE_DATASETS):
+    return sorted({path for pattern in patterns for path in glob.glob(pattern)})
+
+
+def evaluation_apps(paths=EVALUATION_DATASETS):
+    return {record["appId"] for path in paths if os.path.exists(path) for record in read_records(path)}
+
+
+def build_index(paths=None, exclude=None):
+    # permission frequencies per category over the reference apps, apps in `exclude` (default: the
+    # evaluation sets) are skipped so the evaluation never scores apps against a baseline they are part of
+    paths = baseline_paths() if paths is None else paths
+    exclude = evaluation_apps() if exclude is None else exclude
+    apps = Counter()
+    counts = defaultdict(Counter)
+    for path in paths:
+        for record in read_records(path):
+            if not isinstance(record, dict) or not record.get("permissions") or record.get("appId") in exclude:
+                continue
+            for category in (record.get("categoryId") or "", "*"):
+                apps[category] += 1
+                counts[category].update(permission_set(record["permissions"]))
+
+    return {
+        category: {"apps": apps[category], "frequency": {p: round(n / apps[category], 4) for p, n in counts[category].items()}}
+        for category in apps
+    }
+
+
+def save_index(index, path=INDEX_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+
+
+@functools.lru_cache(maxsize=1)
+def get_index(path=INDEX_FILE):
+    # built once from the baseline datasets and reused across runs, rebuild with `python permission_index.py`
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    index = build_index()
+    # no reference apps crawled yet, tried again on the next run
+    if index:
+        save_index(index, path)
+    return index
+
+
+def score_permissions(permissions, category_id=None, index=None):
+    index = index or get_index()
+    baseline = index.get(category_id or "")
+    if not baseline or baseline["apps"] < MIN_CATEGORY_APPS:
+        baseline = index.get("*", {"apps": 0, "frequency": {}})
+
+    perms = permission_set(permissions)
+    sensitive = sorted((p for p in perms if PERMISSION_WEIGHTS.get(p)), key=lambda p: -PERMISSION_WEIGHTS[p])
+    risk = sum(PERMISSION_WEIGHTS[p] for p in sensitive)
+    frequency = baseline["frequency"]
+    unusual = [p for p in sensitive if baseline["apps"] and frequency.get(p, 0) < UNUSUAL_FREQUENCY]
+    common = {p for p, f in frequency.items() if f >= COMMON_FREQUENCY}
+    coverage = round(len(perms & common) / len(common), 2) if common else 0
+    return {
+        "risk": risk,
+        "sensitive": sensitive,
+        "unusual": unusual,
+        "coverage": coverage,
+        "baselineApps": baseline["apps"],
+        "flagged": bool(unusual),
+        # an empty or missing permission set, or a category without enough reference apps, is never typical
+        "typical": bool(perms)
+        and baseline["apps"] >= MIN_CATEGORY_APPS
+        and coverage >= TYPICAL_COVERAGE
+        and not unusual,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the per-category permission baseline index")
+    parser.add_argument("paths", nargs="*", help="reference datasets, defaults to the crawled category datasets")
+    parser.add_argument("--out", default=INDEX_FILE)
+    args = parser.parse_args()
+    index = build_index(args.paths or None)
+    save_index(index, args.out)
+    print(f"Wrote {args.out}: " + ", ".join(f"{c} ({v['apps']} apps)" for c, v in index.items()))
@@ -0,0 +1,187 @@
+import argparse
+import queue
+import threading
+from contextlib import nullcontext
+
+from checkpoint import Checkpoint
+from data import add_info, get_app_details
+from llm import MODES, analyze
+from play_scraper import discover_app_ids
+from records import write_records
+from refresh import refresh_analysis, refresh_info
+from tracing import profile, trace
+
+# marks the end of a stage's input
+DONE = object()
+
+
+class Stage:
+    def __init__(self, name, fn, workers=1):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+
+
+def run_pipeline(source, stages, queue_size=8):
+    # Runs `source` through the stages with bounded queues in between, every stage has its own worker threads.
+    # A full queue blocks the stage feeding it (backpressure), so a slow stage never piles up work in memory.
+    # Yields the last stage's outputs as they complete. Stage functions returning None or raising drop the item.
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+
+    def feed():
+        try:
+            for item in source:
+                queues[0].put(item)
+        except Exception as e:
+            print(f"XXXX source XXXX - {e}")
+        for _ in range(stages[0].workers):
+            queues[0].put(DONE)
+
+    def work(index, stage, remaining):
+        inbox, outbox = queues[index], queues[index + 1]
+        consumers = stages[index + 1].workers if index + 1 < len(stages) else 1
+        while (item := inbox.get()) is not DONE:
+            try:
+                result = stage.fn(item)
+            except Exception as e:
+                print(f"XXXX {stage.name} XXXX - {e}")
+                continue
+            if result is not None:
+                outbox.put(result)
+
+        # the last worker of a stage to finish closes the next stage's input
+        with remaining["lock"]:
+            remaining["count"] -= 1
+            if remaining["count"] == 0:
+                for _ in range(consumers):
+                    outbox.put(DONE)
+
+    threads = [threading.Thread(target=feed, daemon=True)]
+    for index, stage in enumerate(stages):
+        remaining = {"count": stage.workers, "lock": threading.Lock()}
+        threads += [threading.Thread(target=work, args=(index, stage, remaining), daemon=True) for _ in range(stage.workers)]
+    for thread in threads:
+        thread.start()
+
+    while (item := queues[-1].get()) is not DONE:
+        yield item
+
+
+def analyze_app(app, **kwargs):
+    result = analyze(app, **kwargs)
+    # a missing verdict is treated as a failure so checkpointed runs retry it
+    if not result.get("overall_analysis"):
+        raise ValueError("no overall analysis")
+    return result
+
+
+def category_stages(
+    checkpoint, details=4, enrich=4, analysis=2, prescreen=False, incremental=False, per_developer=False, mode="multi"
+):
+    if incremental:
+        return refresh_stages(checkpoint, details, enrich, analysis, prescreen, per_developer)
+
+    def details_stage(app_id):
+        return checkpoint.run(app_id, "details", get_app_details, app_id, filename=None)
+
+    def enrich_stage(app):
+        return checkpoint.run(app["appId"], "add_info", add_info, app)
+
+    # results of each mode are checkpointed apart, a run with another --mode does not pick up the last one's.
+    # multi keeps the plain "analyze" stage that refresh.py and earlier checkpoints use
+    stage = "analyze" if mode == "multi" else f"analyze_{mode}"
+
+    def analyze_stage(app):
+        if result := checkpoint.run(
+            app["appId"], stage, analyze_app, app, prescreen=prescreen, per_developer=per_developer, mode=mode
+        ):
+            return {"appId": app["appId"], "url": app["url"], **result}
+
+    return [
+        Stage("details", details_stage, details),
+        Stage("add_info", enrich_stage, enrich),
+        Stage("analyze", analyze_stage, analysis),
+    ]
+
+
+def refresh_stages(checkpoint, details=4, enrich=4, analysis=2, prescreen=False, per_developer=False):
+    # incremental run: details are always fetched again (one cheap call per app), add_info and the aspects
+    # are only redone for the sections that changed since the last run, new apps go through the full path
+    def details_stage(app_id):
+        details = get_app_details(app_id, filename=None)
+        checkpoint.save(app_id, "details", details)
+        return details
+
+    def enrich_stage(details):
+        return refresh_info(checkpoint, details)
+
+    def analyze_stage(app):
+        result = refresh_analysis(checkpoint, app, prescreen=prescreen, per_developer=per_developer)
+        return {"appId": app["appId"], "url": app["url"], **result}
+
+    return [
+        Stage("details", details_stage, details),
+        Stage("add_info", enrich_stage, enrich),
+        Stage("analyze", analyze_stage, analysis),
+    ]
+
+
+def run_category(
+    category,
+    country,
+    details=4,
+    enrich=4,
+    analysis=2,
+    queue_size=8,
+    out=None,
+    prescreen=False,
+    incremental=False,
+    per_developer=False,
+    mode="multi",
+):
+    # discover -> details -> enrich -> analyze with every stage overlapping the others
+    checkpoint = Checkpoint(f"dataset/checkpoint_{category}_{country}.jsonl")
+    stages = category_stages(checkpoint, details, enrich, analysis, prescreen, incremental, per_developer, mode)
+    results = run_pipeline(discover_app_ids(category, country), stages, queue_size=queue_size)
+    out = out or f"results/results_{category}_{country}.jsonl"
+    count = write_records(out, results)
+    print(f"Wrote {count} results to {out}")
+    return out
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Crawl, enrich and analyze a play store category")
+    parser.add_argument("category")
+    parser.add_argument("country")
+    parser.add_argument("--details", type=int, default=4, help="get_app_details workers")
+    parser.add_argument("--enrich", type=int, default=4, help="add_info workers")
+    parser.add_argument("--analysis", type=int, default=2, help="analyze workers")
+    parser.add_argument("--queue-size", type=int, default=8)
+    parser.add_argument("--out")
+    parser.add_argument("--prescreen", action="store_true", help="skip the llm for clear-cut apps")
+    parser.add_argument("--incremental", action="store_true", help="only redo the work whose inputs changed since the last run")
+    parser.add_argument("--mode", choices=MODES, default="multi", help="combined: one gemini call per app")
+    parser.add_argument("--per-developer", action="store_true", help="one developer analysis per developer")
+    parser.add_argument("--trace", help="append every span to this jsonl file and print a summary table")
+    parser.add_argument("--profile", help="run under cProfile (every thread) and dump the merged stats to this file")
+    args = parser.parse_args()
+    if args.incremental and args.mode != "multi":
+        # refreshes re-run single aspects, which only the multi-call mode has
+        parser.error("--incremental needs --mode multi")
+    with trace(args.trace) if args.trace else nullcontext(), profile(args.profile) if args.profile else nullcontext():
+        run_category(
+            args.category,
+            args.country,
+            args.details,
+            args.enrich,
+            args.analysis,
+            args.queue_size,
+            args.out,
+            args.prescreen,
+            args.incremental,
+            args.per_developer,
+            args.mode,
+        )
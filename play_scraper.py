@@ -1,10 +1,13 @@
 import json
 import os
 
-from playwright.sync_api import sync_playwright
 from serpapi import GoogleSearch
 
+from browser import pool
+from checkpoint import Checkpoint
 from data import add_info, get_app_details, search_apps
+from ratelimit import call
+from records import read_records, write_records
 
 # https://watch.appfollow.io/apps/my-first-workspace/aso/rankings/android/in/finance?date=2025-04-03
 
@@ -24,7 +27,7 @@ def serpapi_category_apps(category: str, country: str):
         params = {"engine": "google_play", "gl": country, "apps_category": category, "chart": chart, "api_key": os.getenv("SERPAPI_API_KEY")}
         try:
             search = GoogleSearch(params)
-            results = search.get_dict()
+            results = call("serpapi", search.get_dict)
             apps = [app["product_id"] for app in results["top_charts"]]
         except:
             apps = []
@@ -33,10 +36,10 @@ def serpapi_category_apps(category: str, country: str):
     return list(set(all_apps))
 
 
-def get_section_links(section):
-    links = section.query_selector_all("a")
-    links = [link.get_attribute("href") for link in links if link.get_attribute("href")]
-    links = [link for link in links if "details?id=" in link]
+async def get_section_links(section):
+    links = await section.query_selector_all("a")
+    links = [await link.get_attribute("href") for link in links]
+    links = [link for link in links if link and "details?id=" in link]
     return links
 
 
@@ -48,39 +51,52 @@ def get_app_ids(links):
     return app_ids
 
 
+async def category_page_links(page, category: str, country: str):
+    all_links = []
+    await page.goto(f"https://play.google.com/store/apps/category/{category}?gl={country}")
+
+    # Wait for the page to load
+    await page.wait_for_selector("section")
+
+    sections = await page.query_selector_all("section")
+    for section in sections:
+        buttons = await section.query_selector_all("button[role='button']")
+        if buttons:
+            for button in buttons:
+                await button.click()
+                await page.wait_for_timeout(1000)
+
+                all_links.extend(await get_section_links(section))
+        else:
+            all_links.extend(await get_section_links(section))
+    return all_links
+
+
 def scrape_category_apps(category: str, country: str):
     # https://serpapi.com/google-countries
-
-    all_links = []
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        context = browser.new_context()
-        page = context.new_page()
-        page.goto(f"https://play.google.com/store/apps/category/{category}?gl={country}")
-
-        # Wait for the page to load
-        page.wait_for_selector("section")
-
-        sections = page.query_selector_all("section")
-        for section in sections:
-            buttons = section.query_selector_all("button[role='button']")
-            if buttons:
-                for button in buttons:
-                    button.click()
-                    page.wait_for_timeout(1000)
-
-                    all_links.extend(get_section_links(section))
-            else:
-                all_links.extend(get_section_links(section))
-
-        context.close()
-        browser.close()
+    # runs on the shared warm browser instead of launching a new one
+    all_links = pool.run(category_page_links, category, country)
 
     apps = get_app_ids(all_links)
     apps = list(set(apps))
     return apps
 
 
+def discover_app_ids(category: str, country: str):
+    # same sources as get_category_apps, but unique ids are yielded as soon as each source returns
+    seen = set()
+    for source in (scrape_category_apps, serpapi_category_apps, search_apps):
+        try:
+            app_ids = source(category, country)
+        except Exception as e:
+            print(f"XXXX {source.__name__} XXXX - {e}")
+            continue
+        for app_id in app_ids:
+            if app_id not in seen:
+                seen.add(app_id)
+                yield app_id
+
+
 def get_category_apps(category: str, country: str):
     # Added three sources - playwright scraping, serpapi charts, and search
     # since google play store only shows 40-50 apps for each chart (topselling - free/paid, top grossing)
@@ -95,24 +111,39 @@ def get_category_apps(category: str, country: str):
     return app_ids
 
 
-def create_category_dataset(category: str, country: str, info=True):
-    filename = f"dataset/dataset_{category}_{country}.json"
-    app_ids = get_category_apps(category, country)
+def category_records(category: str, country: str, checkpoint=None):
+    # yields each app's expanded details as soon as it is ready
+    checkpoint = checkpoint or Checkpoint(f"dataset/checkpoint_{category}_{country}.jsonl")
+    app_ids = checkpoint.run(f"{category}_{country}", "discover", get_category_apps, category, country) or []
+    for i, app_id in enumerate(app_ids):
+        print(f"-----{i}-----")
+        details = checkpoint.run(app_id, "details", get_app_details, app_id, filename=None)
+        if details is None:
+            continue
+        details = checkpoint.run(app_id, "add_info", add_info, details)
+        if details is not None:
+            yield details
 
-    dataset = []
+
+def write_category_dataset(category: str, country: str, info=True):
+    # streams the dataset to jsonl and returns its path, records are written as they finish
+    # progress is also checkpointed per app and stage, a restarted crawl skips finished work and retries failures
+    filename = f"dataset/dataset_{category}_{country}.jsonl"
+    checkpoint = Checkpoint(f"dataset/checkpoint_{category}_{country}.jsonl")
 
     if info:
-        for i, app_id in enumerate(app_ids):
-            try:
-                print(f"-----{i}-----")
-                details = get_app_details(app_id)
-                details = add_info(details)
-                dataset.append(details)
-            except Exception as e:
-                print(f"XXXX {i} XXXX - {e}")
+        records = category_records(category, country, checkpoint)
     else:
-        dataset = app_ids
+        records = checkpoint.run(f"{category}_{country}", "discover", get_category_apps, category, country) or []
+
+    write_records(filename, records)
+    return filename
 
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(dataset, f, indent=4)
+
+def create_category_dataset(category: str, country: str, info=True):
+    # writes dataset/dataset_<category>_<country>.json and returns the records (app ids with info=False) as a list,
+    # on top of the checkpointed write_category_dataset
+    dataset = list(read_records(write_category_dataset(category, country, info)))
+    with open(f"dataset/dataset_{category}_{country}.json", "w", encoding="utf-8") as f:
+        json.dump(dataset, f, indent=4, ensure_ascii=False, default=str)
     return dataset
@@ -0,0 +1,123 @@
+from review_features import review_features
+
+# permission groups that give access to personal data or device features
+SENSITIVE_PERMISSIONS = {
+    "SMS",
+    "Contacts",
+    "Phone",
+    "Location",
+    "Camera",
+    "Microphone",
+    "Calendar",
+    "Identity",
+    "Device ID & call information",
+    "Wearable sensors/activity data",
+}
+FREE_EMAIL_DOMAINS = {"gmail.com", "yahoo.com", "hotmail.com", "outlook.com", "yandex.com", "proton.me", "protonmail.com"}
+
+# a score at or above GENUINE_THRESHOLD / at or below FRAUD_THRESHOLD skips the llm
+GENUINE_THRESHOLD = 6
+FRAUD_THRESHOLD = -5
+
+
+def distribution(app_data):
+    dist = app_data.get("metrics", {}).get("ratings", {}).get("distribution") or {}
+    # json round-trips turn the 1-5 keys into strings
+    return [dist.get(star, dist.get(str(star), 0)) or 0 for star in range(1, 6)]
+
+
+def has_value(value):
+    return bool(value) and value != "N/A"
+
+
+def score_app(app_data):
+    # deterministic score from metadata only, positive leans genuine and negative leans fraud.
+    # returns (score, signals) where signals lists the reasons that moved the score
+    score = 0
+    signals = []
+
+    def add(points, reason):
+        nonlocal score
+        score += points
+        signals.append(f"{reason} ({points:+d})")
+
+    metrics = app_data.get("metrics", {})
+    installs = (metrics.get("installs") or {}).get("min") or 0
+    if installs >= 100_000_000:
+        add(5, f"{installs:,}+ installs")
+    elif installs >= 10_000_000:
+        add(3, f"{installs:,}+ installs")
+    elif installs >= 1_000_000:
+        add(1, f"{installs:,}+ installs")
+    elif installs < 1_000:
+        add(-2, f"only {installs:,}+ installs")
+
+    dist = distribution(app_data)
+    total = sum(dist)
+    if total >= 100:
+        ones, fives = dist[0] / total, dist[4] / total
+        middle = sum(dist[1:4]) / total
+        # organic ratings are rarely polarized with an empty middle
+        if ones >= 0.3 and fives >= 0.4 and middle < 0.15:
+            add(-2, "polarized J-shaped rating histogram")
+        if ones >= 0.5:
+            add(-2, f"{ones:.0%} one-star ratings")
+        average = metrics.get("ratings", {}).get("average") or 0
+        if average >= 4.0 and total >= 10_000:
+            add(1, f"{average:.1f} average over {total:,} ratings")
+    elif installs >= 10_000:
+        add(-1, f"{total} ratings for {installs:,}+ installs")
+
+    developer = app_data.get("developer", {})
+    email = developer.get("email", "")
+    if not has_value(email):
+        add(-2, "no developer email")
+    elif email.split("@")[-1].lower() in FREE_EMAIL_DOMAINS:
+        add(-1, "free-mail developer email")
+    else:
+        add(1, "company developer email")
+    if has_value(developer.get("website")):
+        add(1, "developer website")
+    else:
+        add(-1, "no developer website")
+    if not has_value(developer.get("privacyPolicy")):
+        add(-1, "no privacy policy")
+    if (valid := app_data.get("emailValid")) and valid.get("format_valid") is False:
+        add(-2, "invalid developer email")
+
+    groups = set(app_data.get("permissions") or {})
+    sensitive = sorted(groups & SENSITIVE_PERMISSIONS)
+    if len(sensitive) >= 4:
+        add(-2, f"sensitive permissions: {', '.join(sensitive)}")
+    elif "SMS" in sensitive and installs < 100_000:
+        add(-2, "SMS access on a small app")
+
+    features = review_features(app_data.get("reviews") or [])
+    if features["count"] >= 20:
+        low = features["scoreShare"]["1"] + features["scoreShare"]["2"]
+        if low >= 0.6:
+            add(-2, f"{low:.0%} of sampled reviews are 1-2 stars")
+        elif low <= 0.2:
+            add(1, f"only {low:.0%} of sampled reviews are 1-2 stars")
+        if features["nearDuplicateRate"] >= 0.3:
+            add(-2, f"{features['nearDuplicateRate']:.0%} near-duplicate reviews")
+        if features["scoreSentimentMismatchRate"] >= 0.3:
+            add(-1, f"{features['scoreSentimentMismatchRate']:.0%} reviews contradict their score")
+
+    return score, signals
+
+
+def prescreen(app_data, genuine_threshold=GENUINE_THRESHOLD, fraud_threshold=FRAUD_THRESHOLD):
+    # returns a confident {"type", "reason", "score", "signals"} verdict, or None when the app needs the llm
+    score, signals = score_app(app_data)
+    if score >= genuine_threshold:
+        verdict = "genuine"
+    elif score <= fraud_threshold:
+        verdict = "fraud"
+    else:
+        return None
+
+    reason = f"Heuristic pre-screen score {score}: " + "; ".join(signals)
+    if len(reason) > 300:
+        reason = reason[:297] + "..."
+    return {"type": verdict, "reason": reason, "score": score, "signals": signals}
@@ -0,0 +1,51 @@
+import argparse
+import json
+from collections import defaultdict
+from itertools import islice
+
+from llm import ASPECTS, PROMPTS, overall_prompt
+from records import read_records
+from utils import count_tokens
+
+# stands in for the aspect results in the overall prompt, a verdict with a full length reason
+SAMPLE_RESULT = {"type": "suspected", "reason": "x" * 300}
+
+
+def prompt_tokens(app_data, compact):
+    tokens = {name: count_tokens(prompt(app_data, compact)) for name, prompt in PROMPTS.items()}
+    results = {name: SAMPLE_RESULT for name in ASPECTS}
+    tokens["overall_analysis"] = count_tokens(overall_prompt(results, app_data, compact))
+    return tokens
+
+
+def token_savings(records):
+    # prompt tokens per aspect of the verbose and the compact prompts, summed over the records
+    verbose, compact = defaultdict(int), defaultdict(int)
+    count = 0
+    for app_data in records:
+        for name, tokens in prompt_tokens(app_data, False).items():
+            verbose[name] += tokens
+        for name, tokens in prompt_tokens(app_data, True).items():
+            compact[name] += tokens
+        count += 1
+
+    rows = {}
+    for name in [*verbose, "total"]:
+        before = sum(verbose.values()) if name == "total" else verbose[name]
+        after = sum(compact.values()) if name == "total" else compact[name]
+        rows[name] = {
+            "verbose": round(before / count) if count else 0,
+            "compact": round(after / count) if count else 0,
+            "saved": round(1 - after / before, 3) if before else None,
+        }
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare prompt tokens per app of the verbose and compact prompts")
+    parser.add_argument("path")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = token_savings(islice(read_records(args.path), args.limit))
+    print(json.dumps(rows, indent=2))
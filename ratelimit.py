@@ -0,0 +1,129 @@
+import random
+import re
+import threading
+import time
+
+from tracing import current_span
+
+# (requests per minute, tokens per minute) for each model / service, None means unlimited.
+# defaults are the gemini free tier quotas, bump them with set_limit on a paid key.
+LIMITS = {
+    "gemini-2.0-flash": (15, 1_000_000),
+    "gemini-2.0-flash-lite": (30, 1_000_000),
+    "firecrawl": (10, None),
+    "serpapi": (60, None),
+}
+DEFAULT_LIMIT = (60, None)
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+# Refills at per_minute / 60 per second. The capacity is at least 1, so a fraction of a quota (scale_limits with
+# a share under 1 rpm) still admits whole requests, at the fractional rate. An amount over the capacity waits for
+# a full bucket and is charged in full, the bucket goes negative and later callers wait for the debt to refill.
+class TokenBucket:
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60
+        self.capacity = max(capacity or per_minute, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        needed = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= needed:
+                    self.tokens -= amount
+                    return
+                wait = (needed - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimiter:
+    def __init__(self, rpm, tpm=None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+
+    def acquire(self, tokens=0):
+        if self.requests:
+            self.requests.acquire()
+        if self.tokens and tokens:
+            self.tokens.acquire(tokens)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name):
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = RateLimiter(*LIMITS.get(name, DEFAULT_LIMIT))
+        return _limiters[name]
+
+
+def set_limit(name, rpm, tpm=None):
+    with _limiters_lock:
+        LIMITS[name] = (rpm, tpm)
+        _limiters[name] = RateLimiter(rpm, tpm)
+
+
+def scale_limits(share):
+    # gives this process `share` of every quota, e.g. 1/4 in each of four worker processes using the same api keys
+    global DEFAULT_LIMIT
+
+    def scale(limit):
+        return tuple(value * share if value else value for value in limit)
+
+    with _limiters_lock:
+        for name, limit in LIMITS.items():
+            LIMITS[name] = scale(limit)
+        DEFAULT_LIMIT = scale(DEFAULT_LIMIT)
+        _limiters.clear()
+
+
+def estimate_tokens(text):
+    # rough count, good enough for budgeting against tpm without running a tokenizer
+    return len(text) // 4 + 1
+
+
+def status_code(exc):
+    # google-genai errors carry `.code`, requests errors carry `.response.status_code`,
+    # firecrawl / serpapi only put the status in the message
+    for attr in ("code", "status_code"):
+        if isinstance(code := getattr(exc, attr, None), int):
+            return code
+    response = getattr(exc, "response", None)
+    if isinstance(code := getattr(response, "status_code", None), int):
+        return code
+    if match := re.search(r"\b(429|5\d\d)\b", str(exc)):
+        return int(match.group(1))
+    return None
+
+
+def is_retryable(exc):
+    # requests' connection errors don't subclass the builtin ones
+    if isinstance(exc, (ConnectionError, TimeoutError)) or type(exc).__name__ in ("ConnectionError", "Timeout", "ReadTimeout"):
+        return True
+    return status_code(exc) in RETRY_STATUS
+
+
+def call(name, fn, *args, tokens=0, retries=5, base_delay=1, max_delay=60, **kwargs):
+    # wait for quota on `name`, then call fn, retrying 429/5xx with exponential backoff and full jitter
+    limiter = get_limiter(name)
+    for attempt in range(retries + 1):
+        limiter.acquire(tokens)
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2**attempt))
+            if record := current_span():
+                record["retries"] = record.get("retries", 0) + 1
+            print(f"Retrying {name} in {delay:.1f}s ({attempt + 1}/{retries}) - {e}")
+            time.sleep(delay)
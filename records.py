@@ -0,0 +1,54 @@
+import argparse
+import gzip
+import json
+
+
+# Streaming record format: one json object per line (.jsonl), optionally gzip compressed (.jsonl.gz).
+# Readers and writers handle a single record at a time so memory stays flat for any category size.
+def open_records(path, mode="r"):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def read_records(path):
+    # legacy pretty-printed .json arrays can only be loaded whole, convert them once with `convert`
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        # a single record, like sample/app_details.json
+        yield from [data] if isinstance(data, dict) else data
+        return
+
+    with open_records(path) as f:
+        for line in f:
+            if line := line.strip():
+                yield json.loads(line)
+
+
+def write_records(path, records, append=False):
+    # each record is flushed as soon as it is written, so a reader can consume the file while it grows
+    count = 0
+    with open_records(path, "a" if append else "w") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            count += 1
+    return count
+
+
+def convert(path, out=None, compress=False):
+    if out is None:
+        out = path.removesuffix(".json") + (".jsonl.gz" if compress else ".jsonl")
+    count = write_records(out, read_records(path))
+    print(f"{path} -> {out} ({count} records)")
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert json array datasets to jsonl")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--gzip", action="store_true", help="write .jsonl.gz")
+    args = parser.parse_args()
+    for path in args.paths:
+        convert(path, compress=args.gzip)
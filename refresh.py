@@ -0,0 +1,148 @@
+import argparse
+
+from cache import make_key
+from checkpoint import Checkpoint
+from data import add_info, get_app_details, update_info
+from llm import ASPECTS, BASIC_EXCLUDE, analyze, analyze_aspects, analyze_overall
+from prescreen import prescreen as prescreen_app
+from records import write_records
+from tracing import traced
+
+
+def details_section(app_data):
+    # everything analyze_basic sees, minus the counters that move every day. The rating is rounded and
+    # installs kept as the play store bucket ("1,000,000+"), so only real shifts re-run the description analysis
+    metrics = app_data.get("metrics", {})
+    rating = metrics.get("ratings", {}).get("average")
+    section = {k: v for k, v in app_data.items() if k not in BASIC_EXCLUDE and k not in ("metrics", "comments")}
+    return section | {
+        "rating": round(rating, 1) if isinstance(rating, (int, float)) else rating,
+        "installs": metrics.get("installs", {}).get("text"),
+    }
+
+
+# input sections of an expanded record, each fingerprinted on its own
+SECTIONS = {
+    "listing": lambda app_data: {k: app_data.get(k) for k in ("title", "summary", "description")},
+    "screenshots": lambda app_data: [app_data["media"]["screenshots"], app_data.get("sharedScreenshots")],
+    # thumbs-up counts change all the time and only order the review sample, the review set is what matters
+    "reviews": lambda app_data: sorted(
+        (review.get("userName") or "", review.get("content") or "", review.get("score") or 0)
+        for review in app_data.get("reviews", [])
+    ),
+    "developer": lambda app_data: [app_data["developer"], app_data.get("emailValid"), app_data.get("websiteContent")],
+    "permissions": lambda app_data: [app_data.get("permissions"), app_data.get("categoryId")],
+    "details": details_section,
+}
+
+# the sections each aspect's prompt is built from
+ASPECT_SECTIONS = {
+    "image_analysis": ("listing", "screenshots"),
+    "review_analysis": ("listing", "reviews"),
+    "developer_analysis": ("listing", "developer"),
+    "description_analysis": ("details",),
+    "permissions_analysis": ("listing", "permissions"),
+}
+
+
+def fingerprints(app_data):
+    # {"app", "sections", "aspects"}, an aspect whose fingerprint is unchanged can reuse its last result
+    sections = {name: make_key(fn(app_data)) for name, fn in SECTIONS.items()}
+    return {
+        "app": make_key(sections),
+        "sections": sections,
+        "aspects": {name: make_key([sections[s] for s in ASPECT_SECTIONS[name]]) for name in ASPECTS},
+    }
+
+
+def changed_aspects(new, old, results):
+    # aspects whose inputs changed since `results` were produced, or that failed (None) last time
+    old_aspects = (old or {}).get("aspects", {})
+    return [
+        name
+        for name in ASPECTS
+        if results.get(name) is None or new["aspects"][name] != old_aspects.get(name)
+    ]
+
+
+def refresh_info(checkpoint, details):
+    # re-enriches an app whose details were just fetched, reusing the parts of the last add_info that still hold
+    app_id = details["appId"]
+    previous = checkpoint.get(app_id, "add_info")
+    if previous is None:
+        app_data = add_info(details)
+    else:
+        # apps enriched and analyzed before fingerprints were stored, the last record is what they were analyzed on
+        if checkpoint.done(app_id, "analyze") and not checkpoint.done(app_id, "fingerprints"):
+            checkpoint.save(app_id, "fingerprints", fingerprints(previous))
+        app_data = update_info(details, previous)
+    checkpoint.save(app_id, "add_info", app_data)
+    return app_data
+
+
+@traced()
+def refresh_analysis(checkpoint, app_data, max_workers=5, prescreen=False, per_developer=False):
+    # re-runs only the aspects whose input sections changed and keeps the others' previous results.
+    # analyze_overall runs again whenever any aspect did, an untouched app returns its stored results as is
+    app_id = app_data["appId"]
+    results = checkpoint.get(app_id, "analyze")
+    new = fingerprints(app_data)
+
+    if prescreen and prescreen_app(app_data):
+        results = analyze(app_data, prescreen=True)
+    elif results is None or "prescreen" in results:
+        results = analyze(app_data, max_workers=max_workers, per_developer=per_developer)
+    elif changed := changed_aspects(new, checkpoint.get(app_id, "fingerprints"), results):
+        print(f"{app_id}: re-running {', '.join(changed)}")
+        results = {name: results.get(name) for name in ASPECTS} | analyze_aspects(
+            app_data, max_workers, aspects=changed, per_developer=per_developer
+        )
+        results["overall_analysis"] = analyze_overall(results, app_data)
+    else:
+        print(f"{app_id}: unchanged")
+        return results
+
+    # a missing verdict is not stored, the next refresh tries the app again
+    if not results.get("overall_analysis"):
+        raise ValueError("no overall analysis")
+    checkpoint.save(app_id, "analyze", results)
+    checkpoint.save(app_id, "fingerprints", new)
+    return results
+
+
+def refresh_app(checkpoint, app_id, max_workers=5, prescreen=False, per_developer=False):
+    details = get_app_details(app_id, filename=None)
+    checkpoint.save(app_id, "details", details)
+    app_data = refresh_info(checkpoint, details)
+    return refresh_analysis(checkpoint, app_data, max_workers=max_workers, prescreen=prescreen, per_developer=per_developer)
+
+
+def refresh_known(checkpoint, max_workers=5, prescreen=False, per_developer=False):
+    # refreshes every app analyzed before, new apps only show up through discovery (`pipeline.py --incremental`)
+    for i, app_id in enumerate(checkpoint.completed("analyze")):
+        print(f"---- {i} -----")
+        try:
+            results = refresh_app(checkpoint, app_id, max_workers, prescreen, per_developer)
+        except Exception as e:
+            print(f"XXXX {app_id} XXXX - {e}")
+            continue
+        yield {"appId": app_id, "url": checkpoint.get(app_id, "add_info")["url"], **results}
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Re-analyze the already analyzed apps of a category whose inputs changed")
+    parser.add_argument("category")
+    parser.add_argument("country")
+    parser.add_argument("--workers", type=int, default=5, help="concurrent aspect calls per app")
+    parser.add_argument("--prescreen", action="store_true")
+    parser.add_argument("--per-developer", action="store_true", help="one developer analysis per developer")
+    parser.add_argument("--out")
+    args = parser.parse_args()
+
+    checkpoint = Checkpoint(f"dataset/checkpoint_{args.category}_{args.country}.jsonl")
+    out = args.out or f"results/results_{args.category}_{args.country}.jsonl"
+    count = write_records(out, refresh_known(checkpoint, args.workers, args.prescreen, args.per_developer))
+    print(f"Wrote {count} results to {out}")
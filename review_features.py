@@ -0,0 +1,150 @@
+import math
+import re
+import zlib
+from collections import Counter
+
+import numpy as np
+
+# minhash over character shingles, reviews whose estimated jaccard similarity passes
+# DUPLICATE_THRESHOLD are clustered as near-duplicates
+NUM_HASHES = 64
+SHINGLE_SIZE = 5
+DUPLICATE_THRESHOLD = 0.7
+MIN_DUPLICATE_WORDS = 5
+PRIME = 4294967311  # smallest prime above 2**32
+
+_rng = np.random.default_rng(0)
+_A = _rng.integers(1, 2**32, NUM_HASHES, dtype=np.uint64)
+_B = _rng.integers(0, 2**32, NUM_HASHES, dtype=np.uint64)
+
+EMOJI = re.compile("[\U0001f300-\U0001faff☀-➿⭐❤]")
+WORD = re.compile(r"[a-z']+")
+POSITIVE = set("good great best love excellent amazing awesome nice helpful easy perfect useful fast smooth".split())
+NEGATIVE = set(
+    "bad worst poor fake scam fraud useless waste slow crash crashes bug bugs error problem terrible horrible "
+    "cheat money stolen refund not never don't doesn't can't".split()
+)
+
+
+def normalize(text):
+    return " ".join((text or "").lower().split())
+
+
+def shingles(text, k=SHINGLE_SIZE):
+    if len(text) <= k:
+        return {zlib.crc32(text.encode("utf-8"))}
+    return {zlib.crc32(text[i : i + k].encode("utf-8")) for i in range(len(text) - k + 1)}
+
+
+def minhash_signatures(texts):
+    # (n, NUM_HASHES) matrix, one row per text, computed with a broadcasted universal hash per row
+    signatures = np.empty((len(texts), NUM_HASHES), dtype=np.uint64)
+    for i, text in enumerate(texts):
+        x = np.fromiter(shingles(text), dtype=np.uint64)
+        signatures[i] = ((_A[:, None] * x[None, :] + _B[:, None]) % PRIME).min(axis=1)
+    return signatures
+
+
+def duplicate_clusters(texts, threshold=DUPLICATE_THRESHOLD):
+    # connected components over the estimated-similarity graph, only clusters of 2+ reviews are returned
+    if len(texts) < 2:
+        return []
+    signatures = minhash_signatures(texts)
+    similarity = (signatures[:, None, :] == signatures[None, :, :]).mean(axis=2)
+    adjacency = similarity >= threshold
+
+    labels = np.arange(len(texts))
+    # label propagation, converges in at most diameter steps
+    while True:
+        merged = np.where(adjacency, labels[None, :], len(texts)).min(axis=1)
+        merged = np.minimum(merged, labels)
+        if (merged == labels).all():
+            break
+        labels = merged[merged]
+
+    clusters = [np.flatnonzero(labels == label).tolist() for label in np.unique(labels)]
+    return sorted((c for c in clusters if len(c) > 1), key=len, reverse=True)
+
+
+def entropy(values):
+    counts = np.array(list(Counter(values).values()), dtype=float)
+    if counts.size == 0:
+        return 0.0
+    p = counts / counts.sum()
+    return float(-(p * np.log2(p)).sum())
+
+
+def name_pattern(name):
+    # "John Smith" -> "Aa Aa", "user8213" -> "a9", collapses runs so only the shape remains
+    shape = re.sub(r"[A-Z]", "A", name or "")
+    shape = re.sub(r"[a-z]", "a", shape)
+    shape = re.sub(r"[0-9]", "9", shape)
+    return re.sub(r"(.)\1+", r"\1", shape)
+
+
+def sentiment(text):
+    words = WORD.findall(text)
+    pos = sum(word in POSITIVE for word in words)
+    neg = sum(word in NEGATIVE for word in words)
+    return 0.0 if pos + neg == 0 else (pos - neg) / (pos + neg)
+
+
+def gini(values):
+    values = np.sort(np.asarray(values, dtype=float))
+    if values.size == 0 or values.sum() == 0:
+        return 0.0
+    n = values.size
+    return float((2 * np.arange(1, n + 1) - n - 1).dot(values) / (n * values.sum()))
+
+
+def review_features(reviews):
+    # compact numeric review-authenticity signals, meant to replace the raw review dump in prompts
+    # older datasets hold the same review several times from overlapping sources
+    unique = {(review.get("userName"), review.get("content")): review for review in reviews if review.get("content")}
+    reviews = list(unique.values())
+    n = len(reviews)
+    if n == 0:
+        return {"count": 0}
+
+    texts = [normalize(review["content"]) for review in reviews]
+    scores = np.array([review.get("score") or 0 for review in reviews], dtype=float)
+    thumbs = np.array([review.get("thumbsUpCount") or 0 for review in reviews], dtype=float)
+    names = [review.get("userName") or "" for review in reviews]
+    sentiments = np.array([sentiment(text) for text in texts])
+    lengths = np.array([len(text.split()) for text in texts])
+
+    # short generic reviews ("good app") repeat naturally, only longer ones count as near-duplicates
+    long = np.flatnonzero(lengths >= MIN_DUPLICATE_WORDS)
+    clusters = [[int(long[i]) for i in c] for c in duplicate_clusters([texts[i] for i in long])]
+    duplicated = sum(len(c) for c in clusters)
+
+    # a word trigram used by several different reviews
+    trigram_sets = [set(zip(words, words[1:], words[2:])) for words in (WORD.findall(text) for text in texts)]
+    trigram_counts = Counter(trigram for trigrams in trigram_sets for trigram in trigrams)
+    repeated = {trigram for trigram, count in trigram_counts.items() if count >= 3}
+    emojis = [EMOJI.findall(text) for text in texts]
+    emoji_counts = Counter(e for found in emojis for e in found)
+
+    mismatch = ((scores >= 4) & (sentiments < 0)) | ((scores <= 2) & (sentiments > 0))
+    patterns = [name_pattern(name) for name in names]
+
+    return {
+        "count": n,
+        "meanScore": round(float(scores.mean()), 2),
+        "scoreShare": {str(star): round(float((scores == star).mean()), 3) for star in range(1, 6)},
+        "shortReviewRate": round(float((lengths <= 3).mean()), 3),
+        "nearDuplicateRate": round(duplicated / len(long), 3) if len(long) else 0.0,
+        "nearDuplicateClusters": len(clusters),
+        "largestDuplicateCluster": len(clusters[0]) if clusters else 0,
+        "duplicateExamples": [texts[c[0]][:80] for c in clusters[:3]],
+        "phraseRepetitionRate": round(sum(bool(t & repeated) for t in trigram_sets) / n, 3),
+        "topRepeatedPhrases": [" ".join(t) for t, _ in trigram_counts.most_common(3) if trigram_counts[t] >= 3],
+        "emojiRate": round(sum(bool(found) for found in emojis) / n, 3),
+        "topEmojiShare": round(emoji_counts.most_common(1)[0][1] / n, 3) if emoji_counts else 0.0,
+        "usernamePatternEntropy": round(entropy(patterns), 3),
+        "usernamePatternEntropyMax": round(math.log2(n), 3),
+        "digitUsernameRate": round(sum(bool(re.search(r"\d{3,}", name)) for name in names) / n, 3),
+        "scoreSentimentMismatchRate": round(float(mismatch.mean()), 3),
+        "thumbsUpGini": round(gini(thumbs), 3),
+        "thumbsUpTopShare": round(float(thumbs.max() / thumbs.sum()), 3) if thumbs.sum() else 0.0,
+    }
@@ -1,52 +1,33 @@
-import json
-
 import pandas as pd
 from dotenv import load_dotenv
 
-from data import add_info
-from llm import analyze
-from play_scraper import create_category_dataset
+from checkpoint import Checkpoint
+from pipeline import analyze_app
+from play_scraper import write_category_dataset
+from records import read_records
 
 load_dotenv()
 
 category = "FINANCE"
 country = "IN"
-dataset = create_category_dataset(category, country)
-
-with open("dataset\\dataset_FINANCE_IN.json", encoding="utf-8") as f:
-    dataset = json.load(f)
-
-print("Loaded dataset")
-print("Length:", len(dataset))
-
-expanded = []
-for i in range(len(dataset)):
-    try:
-        print(f"-----{i}-----")
-        old = dataset[i]
-        new = add_info(old)
-        expanded.append(new)
-    except Exception as e:
-        print(f"XXXX {i} XXXX - {e}")
-
-
-with open(f"dataset\\dataset_{category}_{country}_expanded.json", "w", encoding="utf-8") as f:
-    json.dump(expanded, f, indent=4, ensure_ascii=False, default=str)
+# the crawl already runs add_info, the jsonl records are the expanded dataset
+filename = write_category_dataset(category, country)
+# `python pipeline.py FINANCE IN` runs the same stages overlapped instead of as separate passes
+# existing .json datasets can be converted with `python records.py dataset/dataset_FINANCE_IN.json`
 
+# details, add_info and analyze results are checkpointed per app, rerunning the script resumes where it stopped
+checkpoint = Checkpoint(f"dataset/checkpoint_{category}_{country}.jsonl")
 
 results = []
 
-for i, app in enumerate(dataset):
-    try:
-        print(f"---- {i} -----")
-        app_id, url = app["appId"], app["url"]
-        result = analyze(app)
-    except Exception as e:
-        print(f"XXXXX {i} XXXXX")
-        print(e)
+for i, app in enumerate(read_records(filename)):
+    print(f"---- {i} -----")
+    app_id, url = app["appId"], app["url"]
+    result = checkpoint.run(app_id, "analyze", analyze_app, app)
+    if result is None:
         continue
 
-    res = result.pop("overall_analysis", None)
+    res = result.pop("overall_analysis")
     pred, reason = res["type"], res["reason"]
     results.append({
         "app_id": app_id,
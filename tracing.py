@@ -0,0 +1,199 @@
+import argparse
+import contextvars
+import cProfile
+import functools
+import io
+import json
+import pstats
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+
+# spans of the current unit of work (e.g. one app in the evaluation), None when nobody is collecting
+_spans = contextvars.ContextVar("spans", default=None)
+# the enclosing span, so nested spans know their path (analyze_reviews/analyze_fraud/gemini)
+_current = contextvars.ContextVar("current", default=None)
+
+# process-wide trace sink, set by start_trace
+_trace = {"file": None, "spans": None}
+_trace_lock = threading.Lock()
+
+
+@contextmanager
+def collect():
+    # gather every span recorded inside the block, including worker threads started with `submit`
+    spans = []
+    token = _spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _spans.reset(token)
+
+
+@contextmanager
+def span(name, **attrs):
+    # times the block, the yielded dict can be filled with extra fields such as token counts or retries
+    parent = _current.get()
+    record = {"name": name, "path": f"{parent['path']}/{name}" if parent else name, **attrs}
+    token = _current.set(record)
+    start = time.perf_counter()
+    record["start"] = time.time()
+    try:
+        yield record
+    except Exception as e:
+        record["error"] = repr(e)
+        raise
+    finally:
+        record["duration"] = time.perf_counter() - start
+        _current.reset(token)
+        if (spans := _spans.get()) is not None:
+            spans.append(record)
+        if _trace["file"] or _trace["spans"] is not None:
+            _export(record)
+
+
+def current_span():
+    # the innermost open span, lets deeper layers (e.g. the retry loop) annotate it
+    return _current.get()
+
+
+def traced(name=None):
+    # decorator form of `span`, named after the function by default
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name or fn.__name__):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def submit(executor, fn, *args, **kwargs):
+    # executor.submit that carries the current collector and parent span into the worker thread
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def _export(record):
+    line = {k: v for k, v in record.items() if k != "duration"} | {
+        "duration": round(record["duration"], 6),
+        "thread": threading.current_thread().name,
+    }
+    with _trace_lock:
+        if _trace["spans"] is not None:
+            _trace["spans"].append(line)
+        if _trace["file"]:
+            _trace["file"].write(json.dumps(line, ensure_ascii=False, default=str) + "\n")
+            _trace["file"].flush()
+
+
+def start_trace(path=None):
+    # record every span of the process, appended to the jsonl file at `path` when given
+    with _trace_lock:
+        _trace["spans"] = []
+        _trace["file"] = open(path, "a", encoding="utf-8") if path else None
+
+
+def stop_trace():
+    with _trace_lock:
+        spans, file = _trace["spans"], _trace["file"]
+        _trace["spans"] = _trace["file"] = None
+    if file:
+        file.close()
+    return spans or []
+
+
+@contextmanager
+def trace(path=None, summary=True):
+    start_trace(path)
+    spans = []
+    try:
+        yield spans
+    finally:
+        spans.extend(stop_trace())
+        if summary:
+            print(format_summary(summarize(spans)))
+
+
+def summarize(spans):
+    # per span name: count, total / p50 / p95 / max seconds, errors, retries and gemini tokens
+    groups = defaultdict(list)
+    for record in spans:
+        groups[record["name"]].append(record)
+
+    rows = []
+    for name, records in groups.items():
+        durations = np.array([r["duration"] for r in records], dtype=float)
+        rows.append({
+            "name": name,
+            "count": len(records),
+            "total": round(float(durations.sum()), 3),
+            "p50": round(float(np.percentile(durations, 50)), 3),
+            "p95": round(float(np.percentile(durations, 95)), 3),
+            "max": round(float(durations.max()), 3),
+            "errors": sum("error" in r for r in records),
+            "retries": sum(r.get("retries", 0) for r in records),
+            "promptTokens": sum(r.get("promptTokens", 0) for r in records),
+            "outputTokens": sum(r.get("outputTokens", 0) for r in records),
+        })
+    return sorted(rows, key=lambda row: row["total"], reverse=True)
+
+
+def format_summary(rows):
+    columns = ("name", "count", "total", "p50", "p95", "max", "errors", "retries", "promptTokens", "outputTokens")
+    widths = {c: max([len(c)] + [len(str(row[c])) for row in rows]) for c in columns}
+    lines = ["  ".join(c.ljust(widths[c]) if c == "name" else c.rjust(widths[c]) for c in columns)]
+    for row in rows:
+        lines.append("  ".join(str(row[c]).ljust(widths[c]) if c == "name" else str(row[c]).rjust(widths[c]) for c in columns))
+    return "\n".join(lines)
+
+
+@contextmanager
+def profile(path=None, top=25):
+    # optional cProfile hook around a run, stats are dumped to `path` (for snakeviz etc.) and the top entries printed.
+    # A profiler only sees its own thread and the pipeline's main thread just waits on the stage queues, so every
+    # thread started inside the block gets a profiler of its own and their stats are merged at the end
+    profilers = [cProfile.Profile()]
+    lock = threading.Lock()
+
+    def start(frame, event, arg):
+        # the first profile event of a new thread, replaced by the thread's own profiler
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # python 3.12+ allows a single active profiler, the thread is left out
+            sys.setprofile(None)
+            return
+        with lock:
+            profilers.append(profiler)
+
+    profilers[0].enable()
+    threading.setprofile(start)
+    try:
+        yield profilers
+    finally:
+        threading.setprofile(None)
+        profilers[0].disable()
+        with lock:
+            stats = pstats.Stats(*profilers, stream=io.StringIO())
+        if path:
+            stats.dump_stats(path)
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats("cumulative").print_stats(top)
+        print(out.getvalue())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a jsonl trace file")
+    parser.add_argument("path")
+    args = parser.parse_args()
+    with open(args.path, encoding="utf-8") as f:
+        spans = [json.loads(line) for line in f if line.strip()]
+    print(format_summary(summarize(spans)))
@@ -1,5 +1,7 @@
-import asyncio
+import functools
+import json
 import os
+from urllib.parse import urlparse
 
 import requests
 import tiktoken
@@ -8,11 +10,17 @@ from firecrawl import FirecrawlApp
 from playwright.async_api import async_playwright
 from playwright.sync_api import sync_playwright
 
+from browser import pool
+from ratelimit import call
+from tracing import traced
 
+
+@traced()
 def scrape(url, p=True):
     try:
         if p:
-            content = asyncio.run(playwright_scrape_async(url))
+            # pooled browser, no chromium launch per url
+            content = pool.content(url)
             return extract_text(content)
     except:
         content = ""
@@ -25,6 +33,12 @@ def scrape(url, p=True):
     return content
 
 
+def scrape_many(urls):
+    # scrape several developer websites concurrently on the shared browser, firecrawl as fallback
+    pages = pool.content_many(urls)
+    return {url: extract_text(html) if html else scrape(url, p=False) for url, html in pages.items()}
+
+
 def extract_text(content):
     soup = BeautifulSoup(content, "html.parser")
     # Return text content of the page
@@ -70,9 +84,10 @@ async def playwright_scrape_async(url):
     return content
 
 
+@traced()
 def firecrawl_scrape(url):
     app = FirecrawlApp(api_key=os.getenv("FIRECRAWL_API_KEY"))
-    d = app.scrape_url(url, params={"formats": ["markdown"]})
+    d = call("firecrawl", app.scrape_url, url, params={"formats": ["markdown"]})
     return truncate_text(d["markdown"], 2000)
 
 
@@ -93,8 +108,150 @@ def validate_email(email):
     return data
 
 
+@functools.lru_cache(maxsize=None)
+def get_encoder(model="gpt-4"):
+    # building the encoder is expensive, do it once per model
+    return tiktoken.encoding_for_model(model)
+
+
+def count_tokens(text, model="gpt-4"):
+    return len(get_encoder(model).encode(text))
+
+
 def truncate_text(text, max_tokens=8000, model="gpt-4"):
-    tokenizer = tiktoken.encoding_for_model(model)
+    # every token covers at least one utf-8 byte, so short text is under budget without encoding it
+    if len(text.encode("utf-8")) <= max_tokens:
+        return text
+    tokenizer = get_encoder(model)
     tokens = tokenizer.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
     truncated_tokens = tokens[:max_tokens]
     return tokenizer.decode(truncated_tokens)
+
+
+def render_section(value):
+    return value if isinstance(value, str) else json.dumps(value, indent=2, ensure_ascii=False, default=str)
+
+
+# Compact prompt encoding. Payloads are stripped of empty / N/A values, image and store urls, and legal details
+# that repeat the plain ones (legalEmail == email), then written as minified json. Lists of records become a table with
+# one header row, which is what reviews cost the most tokens on.
+EMPTY_VALUES = (None, "", "N/A", [], {})
+# play store noise that says nothing about fraud: image urls, database ids and text copies of numbers
+NOISE_KEYS = {"_id", "icon", "headerImage", "video", "videoImage", "url", "averageText"}
+# tokens of description kept in the prompts that only need to know what the app is about
+DIGEST_TOKENS = 120
+# developer fields dropped when they equal their plain counterpart, any other equal values are kept
+LEGAL_DUPLICATES = {"legalName": "name", "legalEmail": "email", "legalAddress": "address"}
+
+
+def is_url(value):
+    return isinstance(value, str) and value.startswith(("http://", "https://"))
+
+
+def strip_empty(value):
+    # urls are reduced to their host (a privacy policy on the developer's own domain is still visible),
+    # dicts keyed by urls (described screenshots) to their values
+    if isinstance(value, dict):
+        if value and all(is_url(key) for key in value):
+            return strip_empty(list(value.values()))
+        stripped = {}
+        for key, item in value.items():
+            item = strip_empty(item)
+            if key in NOISE_KEYS or item in EMPTY_VALUES:
+                continue
+            if key in LEGAL_DUPLICATES and item == strip_empty(value.get(LEGAL_DUPLICATES[key])):
+                continue
+            stripped[key] = item
+        return stripped
+    if isinstance(value, list):
+        return [item for item in map(strip_empty, value) if item not in EMPTY_VALUES]
+    if is_url(value):
+        return urlparse(value).netloc
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def minify(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def table(records):
+    # header row of the union of keys, then one |-separated row per record
+    columns = list(dict.fromkeys(key for record in records for key in record))
+
+    def cell(value):
+        value = "" if value is None else value if isinstance(value, str) else minify(value)
+        return " ".join(value.split()).replace("|", "/")
+
+    rows = ["|".join(columns)] + ["|".join(cell(record.get(c)) for c in columns) for record in records]
+    return "\n".join(rows)
+
+
+def permission_lines(permissions):
+    # {"Location": ["precise location", ...], ...} as one "group: a; b" line per group
+    if isinstance(permissions, dict):
+        return "\n".join(f"{group}: {'; '.join(map(str, items or []))}" for group, items in permissions.items())
+    return minify(permissions)
+
+
+def render_compact(value):
+    if isinstance(value, str):
+        return value
+    value = strip_empty(value)
+    if isinstance(value, list) and value and all(isinstance(record, dict) for record in value):
+        return table(value)
+    return minify(value)
+
+
+def digest(text, max_tokens=DIGEST_TOKENS, model="gpt-4"):
+    # the start of a description, for prompts that only compare against what the app claims to do
+    short = truncate_text(text, max_tokens, model)
+    return short if short == text else short.rstrip() + " ..."
+
+
+def fit_section(value, max_tokens, model="gpt-4", render=render_section):
+    # strings are cut at the token budget, lists keep whole records from the start
+    if isinstance(value, str):
+        return truncate_text(value, max_tokens, model)
+    kept = []
+    used = 2
+    for record in value:
+        used += count_tokens(render([record]), model) + 2
+        if used > max_tokens:
+            break
+        kept.append(record)
+    # the per-record estimate ignores indentation and headers, trim until the rendered list fits
+    while kept and count_tokens(render(kept), model) > max_tokens:
+        kept.pop()
+    return render(kept)
+
+
+def build_prompt(make, sections, max_tokens=8000, model="gpt-4", render=render_section):
+    # make(**rendered_sections) returns the full prompt. When it is over budget, sections under an equal share of
+    # what is left after the fixed text are kept whole and the large ones are cut in proportion to their size.
+    # `render` turns non-string sections into text, render_compact for the compact prompts
+    rendered = {name: render(value) for name, value in sections.items()}
+    prompt = make(**rendered)
+    if len(prompt.encode("utf-8")) <= max_tokens or count_tokens(prompt, model) <= max_tokens:
+        return prompt
+
+    budget = max_tokens - count_tokens(make(**{name: "" for name in sections}), model)
+    sizes = {name: count_tokens(text, model) for name, text in rendered.items()}
+    fitted = {}
+    while sizes:
+        total = sum(sizes.values())
+        small = {name: size for name, size in sizes.items() if size <= budget / len(sizes)}
+        if not small:
+            for name, size in sizes.items():
+                fitted[name] = fit_section(sections[name], max(int(budget * size / total), 0), model, render)
+            break
+        for name, size in small.items():
+            fitted[name] = rendered[name]
+            budget -= size
+            del sizes[name]
+
+    # the fixed text alone may already be over budget
+    return truncate_text(make(**fitted), max_tokens, model)